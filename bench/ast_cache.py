@@ -0,0 +1,18 @@
+"""Loading a serialized analyzed tree against analyzing the source again."""
+from common import *
+from core import serialize
+
+
+def main(functions=100, statements=50):
+    source = program(functions, statements)
+    root = analyze(source)
+    data = serialize.dump(root)
+    assert codegen(serialize.load(data)) == codegen(analyze(source))
+    print('%d source bytes, %d serialized bytes' % (len(source), len(data)))
+    print('analyze: %.3f s' % timeit(lambda: analyze(source), repeat=3))
+    print('dump:    %.3f s' % timeit(lambda: serialize.dump(root), repeat=3))
+    print('load:    %.3f s' % timeit(lambda: serialize.load(data), repeat=3))
+
+
+if __name__ == '__main__':
+    main()
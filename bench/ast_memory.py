@@ -0,0 +1,33 @@
+"""AST construction time and memory for a synthetic 100k-statement program."""
+import tracemalloc
+from common import *
+
+
+def build(statements):
+    block = []
+    for i in range(statements):
+        value = Sum(Number(str(i)), Mul(Reference('x'), Number('2')))
+        if i % 2:
+            block.append(Print(value))
+        else:
+            block.append(VarDecl('v%d' % i, value))
+    module = Module()
+    module.add_child(Function('main', Block(block), VariableList([])))
+    return module
+
+
+def main(statements=100000):
+    elapsed = timeit(lambda: build(statements), repeat=3)
+    tracemalloc.start()
+    module = build(statements)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = statements * 6 + 4
+    print('nodes:        %d' % nodes)
+    print('build time:   %.3f s (%.0f nodes/s)' % (elapsed, nodes / elapsed))
+    print('retained:     %.1f MiB (%.0f bytes/node)' % (current / 2**20, current / nodes))
+    print('peak:         %.1f MiB' % (peak / 2**20))
+
+
+if __name__ == '__main__':
+    main()
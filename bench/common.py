@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from core import *
+
+
+def program(functions=10, statements=50):
+    """Generate a synthetic program."""
+    lines = []
+    for f in range(functions):
+        lines.append('f%d(x int32, y int32) {' % f)
+        for s in range(statements):
+            lines.append('    print(x + %d * y - (x %% 7));' % s)
+            lines.append('    if x < %d { print(y); }' % s)
+        lines.append('}')
+    lines.append('main() {')
+    for f in range(functions):
+        lines.append('    f%d(%d, 2);' % (f, f))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def parse(source):
+    pg = Parser()
+    pg.parse()
+    return pg.get_parser().parse(Lexer().get_lexer().lex(source))
+
+
+def analyze(source):
+    """Parse and analyze a program, ready for code generation."""
+    return PassManager().run(parse(source))
+
+
+def timeit(fn, repeat=5):
+    """Run fn repeatedly and return the best wall time."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
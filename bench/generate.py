@@ -0,0 +1,107 @@
+"""Generate synthetic programs of a chosen shape.
+
+    python generate.py --functions 100 --let-depth 50 > big.cr
+"""
+import argparse
+import random
+
+# Operators whose right operand may be any expression
+OPERATORS = ['+', '-', '*']
+# Operators only used with a nonzero constant on the right
+DIVISIONS = ['/', '%']
+COMPARISONS = ['<', '>', '<=', '>=', '==', '!=']
+
+
+class Generator:
+    def __init__(self, statements=20, let_depth=0, expr_depth=2, if_depth=1, seed=0):
+        self.statements = statements
+        self.let_depth = let_depth
+        self.expr_depth = expr_depth
+        self.if_depth = if_depth
+        self.random = random.Random(seed)
+
+    def expression(self, names, depth):
+        """A random int32 expression with depth levels of operators.
+        Everything is parenthesized, so precedence does not matter."""
+        if depth <= 0:
+            if self.random.random() < 0.5:
+                return str(self.random.randint(1, 99))
+            return self.random.choice(names)
+        left = self.expression(names, depth - 1)
+        if self.random.random() < 0.2:
+            return '(%s %s %d)' % (left, self.random.choice(DIVISIONS), self.random.randint(1, 9))
+        right = self.expression(names, self.random.randint(0, depth - 1))
+        return '(%s %s %s)' % (left, self.random.choice(OPERATORS), right)
+
+    def condition(self, names):
+        depth = max(self.expr_depth - 1, 0)
+        return '%s %s %s' % (self.expression(names, depth), self.random.choice(COMPARISONS),
+                             self.expression(names, depth))
+
+    def statement(self, index, names, callees, indent):
+        if callees and index % 5 == 4:
+            callee = self.random.choice(callees)
+            line = '%s(%s, %s);' % (callee, self.expression(names, self.expr_depth),
+                                    self.expression(names, self.expr_depth))
+        else:
+            line = 'print(%s);' % self.expression(names, self.expr_depth)
+        if not self.if_depth or index % 2:
+            return [indent + line]
+        lines = []
+        for level in range(self.if_depth):
+            lines.append(indent + '    ' * level + 'if %s {' % self.condition(names))
+        lines.append(indent + '    ' * self.if_depth + line)
+        for level in reversed(range(self.if_depth)):
+            lines.append(indent + '    ' * level + '}')
+        return lines
+
+    def function(self, name, callees):
+        """A function of two parameters, with a chain of let_depth lets,
+        each in a scope nested in that of the one before, followed by the
+        statements, which use all of them."""
+        names = ['x', 'y']
+        lines = ['%s(x int32, y int32) {' % name]
+        for level in range(self.let_depth):
+            variable = 'v%d' % level
+            lines.append('    let %s = %s;' % (variable, self.expression(names, self.expr_depth)))
+            names.append(variable)
+        for index in range(self.statements):
+            lines.extend(self.statement(index, names, callees, '    '))
+        lines.append('}')
+        return lines
+
+    def program(self, functions=10):
+        """Functions call only those defined before them, and main calls
+        all of them."""
+        lines = []
+        names = []
+        for index in range(functions):
+            name = 'f%d' % index
+            lines.extend(self.function(name, names))
+            lines.append('')
+            names.append(name)
+        lines.append('main() {')
+        for index, name in enumerate(names):
+            lines.append('    %s(%d, %d);' % (name, index, index + 1))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+
+def generate(functions=10, statements=20, let_depth=0, expr_depth=2, if_depth=1, seed=0):
+    """Generate a program. The same arguments always give the same program."""
+    return Generator(statements, let_depth, expr_depth, if_depth, seed).program(functions)
+
+
+argparser = argparse.ArgumentParser(description="Write a synthetic program to standard output.")
+argparser.add_argument('--functions', type=int, default=10)
+argparser.add_argument('--statements', type=int, default=20, help="statements per function")
+argparser.add_argument('--let-depth', type=int, default=0, help="nested lets per function")
+argparser.add_argument('--expr-depth', type=int, default=2, help="operators deep per expression")
+argparser.add_argument('--if-depth', type=int, default=1, help="ifs nested around every other statement")
+argparser.add_argument('--seed', type=int, default=0)
+
+
+if __name__ == '__main__':
+    args = argparser.parse_args()
+    print(generate(args.functions, args.statements, args.let_depth, args.expr_depth, args.if_depth,
+                   args.seed), end='')
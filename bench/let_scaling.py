@@ -0,0 +1,37 @@
+"""Scoping time for functions with thousands of `let` statements."""
+from common import *
+
+
+def function(lets):
+    block = [VarDecl('v%d' % i, Number(str(i))) for i in range(lets)]
+    block.append(Print(Reference('v0')))
+    module = Module()
+    module.add_child(Function('main', Block(block), VariableList([])))
+    return module
+
+
+def splice(children):
+    """Insert and remove a statement in the middle of a block, repeatedly."""
+    block = Block([Print(Number(str(i))) for i in range(children)])
+    middle = block[children // 2]
+    def run():
+        for i in range(1000):
+            statement = Print(Number(str(i)))
+            middle.replace(middle, statement)
+            statement.delete()
+    return timeit(run, repeat=3)
+
+
+def main():
+    for children in (1000, 10000, 100000):
+        print('%6d children: %.1f us per splice' % (children, splice(children) * 1000))
+    for lets in (250, 500, 1000):
+        elapsed = timeit(lambda: scope(function(lets)), repeat=3)
+        print('%5d lets: %.3f s' % (lets, elapsed))
+    for lets in (1000, 10000, 100000):
+        elapsed = timeit(lambda: scope(function(lets), flat=True), repeat=3)
+        print('%5d lets, flat: %.3f s' % (lets, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""Lexer throughput, against the rply lexer."""
+from common import *
+
+
+def main(functions=100, statements=100):
+    source = program(functions, statements)
+    lexers = {'scanner': Lexer().get_lexer(), 'rply': Lexer().get_rply_lexer()}
+    for name, lexer in lexers.items():
+        count = sum(1 for _ in lexer.lex(source))
+        elapsed = timeit(lambda: sum(1 for _ in lexer.lex(source)))
+        print('%-8s %8d tokens, %.3f s, %10.0f tokens/s' % (name, count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
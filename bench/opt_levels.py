@@ -0,0 +1,41 @@
+"""Run time of generated binaries at each optimization level."""
+import subprocess
+import tempfile
+from common import *
+from core.codegen import parse_ir, optimize
+
+# Calls t() 2^depth times, so the run time is dominated by generated code.
+# main() returns void, so the exit status is meaningless.
+SOURCE = '''
+t(n int32, x int32) {
+    if n > 0 {
+        t(n - 1, x * 3 + 1);
+        t(n - 1, x + n * 12 / 5);
+    }
+    if n == 0 {
+        if (x %% 1000003) == 0 { print(x); }
+    }
+}
+
+main() {
+    t(%d, 1);
+}
+'''
+
+
+def main(depth=26):
+    with tempfile.TemporaryDirectory() as tmp:
+        obj = os.path.join(tmp, 'out.o')
+        exe = os.path.join(tmp, 'out')
+        for level in range(4):
+            llvm_ir = codegen(analyze(SOURCE % depth))
+            instructions = sum(1 for function in optimize(parse_ir(llvm_ir), level).functions
+                               for block in function.blocks for _ in block.instructions)
+            emit(llvm_ir, obj, 'obj', level)
+            subprocess.run(['gcc', obj, '-o', exe], check=True)
+            elapsed = timeit(lambda: subprocess.run([exe], stdout=subprocess.DEVNULL))
+            print('-O%d: %4d instructions, %.3f s' % (level, instructions, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""Code generation time for a large module with worker processes."""
+import os
+from common import *
+from core.incremental import IncrementalBuild
+
+
+def main(functions=300, statements=10):
+    root = analyze(program(functions, statements))
+    print('%d functions, %d cpus' % (functions + 1, os.cpu_count()))
+    for jobs in (1, 2, 4):
+        build = IncrementalBuild(jobs=jobs, reuse=False)
+        elapsed = timeit(lambda: build.build(root), repeat=3)
+        print('-j %d: %.3f s' % (jobs, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Check the hand-written parser against the rply one on a corpus, and
+that the corpus compiles to valid IR, then compare their startup time and
+throughput."""
+import glob
+from rply.parsergenerator import LRTable
+from common import *
+from core.pratt import PrattParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Parse the same, but do not compile: comparisons bind tighter than arithmetic
+PARSE_ONLY = ['precedence.cr']
+
+# Each must be rejected at the same token by both parsers
+INVALID = ['main( {', 'main() { print(1) }', 'main() { let = 1; }', 'f(x) {}', 'main() { 1 +; }', 'main() {']
+
+
+def same(a, b):
+    """Whether two trees have the same shape, nodes and names."""
+    if type(a) is not type(b):
+        return False
+    if getattr(a, 'name', None) != getattr(b, 'name', None):
+        return False
+    if isinstance(a, Number) and a.value != b.value:
+        return False
+    if isinstance(a, DictNode):
+        return all(same(a[field], b[field]) for field in a._fields)
+    if isinstance(a, ListNode):
+        a, b = list(a), list(b)
+        return len(a) == len(b) and all(map(same, a, b))
+    return a == b
+
+
+def check(rply, pratt):
+    sources = {path: open(path).read()
+               for path in [os.path.join(HERE, '..', 'test.cr')] + sorted(glob.glob(os.path.join(HERE, 'corpus', '*.cr')))}
+    sources['generated'] = program(20, 20)
+    lexer = Lexer().get_lexer()
+    for name, source in sources.items():
+        tree = rply.parse(lexer.lex(source))
+        assert same(tree, pratt.parse(lexer.lex(source))), name
+        if os.path.basename(name) not in PARSE_ONLY:
+            parse_ir(codegen(PassManager().run(tree), ssa=True))
+    for source in INVALID:
+        errors = []
+        for parser in (rply, pratt):
+            try:
+                parser.parse(lexer.lex(source))
+            except ValueError as e:
+                errors.append(e.args[0].getstr())
+        assert len(errors) == 2 and errors[0] == errors[1], source
+    print('%d sources parse the same and %d invalid ones fail the same' % (len(sources), len(INVALID)))
+
+
+def main(functions=100, statements=100):
+    pg = Parser()
+    pg.parse()
+    rply = pg.get_parser()
+    pratt = PrattParser()
+    check(rply, pratt)
+
+    def build():
+        # What get_parser does without any cached table
+        pg = Parser()
+        pg.parse()
+        grammar = pg._grammar()
+        grammar.build_lritems()
+        grammar.compute_first()
+        grammar.compute_follow()
+        LRTable.from_grammar(grammar)
+    print('rply table construction: %.3f s' % timeit(build, repeat=3))
+
+    tokens = list(Lexer().get_lexer().lex(program(functions, statements)))
+    for name, parser in [('rply', rply), ('pratt', pratt)]:
+        elapsed = timeit(lambda: parser.parse(iter(tokens)), repeat=3)
+        print('%-6s %8d tokens, %.3f s, %9.0f tokens/s' % (name, len(tokens), elapsed, len(tokens) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
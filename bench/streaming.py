@@ -0,0 +1,31 @@
+"""Peak memory of compiling a large file whole and one function at a time."""
+import subprocess
+import tempfile
+from common import *
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+
+def peak(*args):
+    """Run the compiler, returning its peak RSS in MB and wall time."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, MAIN, *args])
+    _, status, usage = os.wait4(process.pid, 0)
+    assert status == 0
+    return usage.ru_maxrss / 1024, time.perf_counter() - start
+
+
+def main(functions=300, statements=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'big.cr')
+        with open(path, 'w') as f:
+            f.write(program(functions, statements))
+        output = os.path.join(tmp, 'out.o')
+        print('%d functions, %.1f MB' % (functions, os.path.getsize(path) / 2**20))
+        for name, args in [('whole', ['--parser', 'pratt']), ('stream', ['--stream'])]:
+            rss, elapsed = peak(path, '--emit', 'obj', '-o', output, *args)
+            print('%-6s %7.1f MB peak, %.2f s' % (name, rss, elapsed))
+
+
+if __name__ == '__main__':
+    main()
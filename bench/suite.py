@@ -0,0 +1,222 @@
+"""Compiler throughput over synthetic programs of growing size, one sweep
+per dimension of their shape. Reports the throughput of each stage and
+end-to-end latency, and how each stage's time grows with the number of
+nodes: an exponent of 1 is linear, 2 quadratic.
+
+    python suite.py -o results.json
+    python suite.py --baseline results.json
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import tempfile
+from common import *
+from generate import generate
+from core import driver
+from core.codegen import optimize
+from core.visitor import *
+from core.instrument import Instrumentation
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'main.py')
+
+# Shape of the programs in every sweep, apart from the dimension swept
+BASE = dict(functions=10, statements=20, let_depth=0, expr_depth=2, if_depth=1)
+
+SWEEPS = {
+    'functions': [25, 50, 100, 200],
+    'statements': [50, 100, 200, 400],
+    'let_depth': [100, 200, 400, 800],
+    'expr_depth': [2, 4, 6, 8],
+    'if_depth': [4, 8, 16, 32],
+}
+
+# The shape of a sweep's programs, where it differs from BASE
+SHAPES = {
+    'statements': dict(functions=2),
+    'let_depth': dict(functions=2, statements=10),
+    'expr_depth': dict(functions=4),
+    'if_depth': dict(functions=4),
+}
+
+# Stages whose throughput is given in tokens and IR instructions per second;
+# for the passes, it is in nodes visited per second
+TOKEN_STAGES = ('lex', 'parse')
+IR_STAGES = ('codegen', 'parse_assembly', 'verify', 'optimize')
+
+
+class Count(Walker):
+    def __init__(self):
+        self.count = 0
+
+    @preorder(Node)
+    def enter(self, node):
+        self.count += 1
+
+
+def instructions(mod):
+    return sum(len(list(block.instructions)) for function in mod.functions for block in function.blocks)
+
+
+def compile_once(source, args):
+    """Compile in-process with instrumentation, but without tracemalloc or
+    timing the hooks of each pass, which would distort the times."""
+    with Instrumentation(memory=False, passes=False) as instrumentation:
+        module = driver.analyze(source, args.flat_scopes, parser=args.parser)
+        count = Count()
+        count.visit(module)
+        mod = parse_ir(codegen(module, ssa=True))
+        if args.opt_level:
+            optimize(mod, args.opt_level)
+    return instrumentation.stages, count.count, mod
+
+
+def latency(source, args, tmp):
+    """Wall time of compiling a file to an object file with main.py, in a
+    new process and without the cache."""
+    path = os.path.join(tmp, 'bench.cr')
+    with open(path, 'w') as f:
+        f.write(source)
+    command = [sys.executable, MAIN, path, '--ssa', '--emit', 'obj', '-o', os.path.join(tmp, 'bench.o'),
+               '-O', str(args.opt_level), '--parser', args.parser]
+    if args.flat_scopes:
+        command.append('--flat-scopes')
+    env = dict(os.environ, CORE_NO_CACHE='1')
+    return timeit(lambda: subprocess.run(command, env=env, check=True, capture_output=True), repeat=args.repeat)
+
+
+def measure(shape, args, tmp):
+    source = generate(**shape)
+    tokens = sum(1 for _ in Lexer().get_lexer().lex(source))
+    best = {}
+    for _ in range(args.repeat):
+        stages, nodes, mod = compile_once(source, args)
+        for name, stage in stages.items():
+            if name not in best or stage.time < best[name]['time']:
+                best[name] = dict(time=stage.time, nodes=stage.nodes)
+    ir_instructions = instructions(mod)
+    throughput = {}
+    for name, stage in best.items():
+        if name in TOKEN_STAGES:
+            amount, unit = tokens, 'tokens/s'
+        elif name in IR_STAGES:
+            amount, unit = ir_instructions, 'instructions/s'
+        else:
+            amount, unit = stage['nodes'], 'nodes/s'
+        throughput[name] = dict(value=amount / stage['time'] if stage['time'] else None, unit=unit)
+    return dict(shape=shape, bytes=len(source), tokens=tokens, nodes=nodes, ir_instructions=ir_instructions,
+                stages={name: stage['time'] for name, stage in best.items()},
+                total=sum(stage['time'] for stage in best.values()),
+                throughput=throughput, latency=latency(source, args, tmp) if args.latency else None)
+
+
+def exponent(sizes, times):
+    """Least squares slope of log(time) against log(size)."""
+    points = [(math.log(size), math.log(time)) for size, time in zip(sizes, times) if size and time]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def sweep(name, values, args, tmp):
+    points = []
+    for value in values:
+        shape = dict(BASE, **SHAPES.get(name, {}))
+        shape[name] = value
+        point = measure(shape, args, tmp)
+        points.append(point)
+        print('%-10s %5d %8d nodes %9.3f s %s' % (
+            name, value, point['nodes'], point['total'],
+            '' if point['latency'] is None else '(%.3f s end to end)' % point['latency']))
+    sizes = [point['nodes'] for point in points]
+    stages = dict.fromkeys(stage for point in points for stage in point['stages'])
+    exponents = {stage: exponent(sizes, [point['stages'].get(stage) for point in points]) for stage in stages}
+    exponents['total'] = exponent(sizes, [point['total'] for point in points])
+    return dict(points=points, exponents=exponents)
+
+
+def report(results):
+    print()
+    print('%-10s %-45s %9s %16s' % ('sweep', 'stage', 'exponent', 'throughput'))
+    for name, result in results['sweeps'].items():
+        last = result['points'][-1]
+        for stage, value in result['exponents'].items():
+            throughput = last['throughput'].get(stage)
+            print('%-10s %-45s %9s %16s' % (
+                name, stage, '-' if value is None else '%.2f' % value,
+                '%.0f %s' % (throughput['value'], throughput['unit'])
+                if throughput and throughput['value'] else ''))
+
+
+def compare(results, baseline, threshold):
+    """Print the stages that got slower, or scale worse, than in a baseline.
+    Returns whether there were any."""
+    regressions = []
+    for name, result in results['sweeps'].items():
+        old = baseline['sweeps'].get(name)
+        if not old:
+            continue
+        for point, old_point in zip(result['points'], old['points']):
+            if point['shape'] != old_point['shape']:
+                continue
+            for stage, elapsed in point['stages'].items():
+                before = old_point['stages'].get(stage)
+                if before and elapsed > before * threshold:
+                    regressions.append('%s=%d %s: %.3f s -> %.3f s' % (
+                        name, point['shape'][name], stage, before, elapsed))
+        if [p['shape'] for p in result['points']] != [p['shape'] for p in old['points']]:
+            continue
+        for stage, value in result['exponents'].items():
+            before = old['exponents'].get(stage)
+            if value is not None and before is not None and value > before + 0.3:
+                regressions.append('%s %s: exponent %.2f -> %.2f' % (name, stage, before, value))
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    return bool(regressions)
+
+
+argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+argparser.add_argument('sweeps', nargs='*', help="sweeps to run, of %s (default: all)" % ', '.join(SWEEPS))
+argparser.add_argument('-o', '--output', help="write the results to this JSON file")
+argparser.add_argument('--baseline', help="compare against the results in this JSON file")
+argparser.add_argument('--threshold', type=float, default=1.25,
+                       help="how many times slower than the baseline a stage may get")
+argparser.add_argument('--quick', action='store_true', help="only the first three sizes of each sweep")
+argparser.add_argument('--repeat', type=int, default=3, help="keep the best of this many runs")
+argparser.add_argument('--no-latency', dest='latency', action='store_false',
+                       help="skip timing main.py end to end")
+argparser.add_argument('--parser', choices=['rply', 'pratt'], default='rply')
+argparser.add_argument('--flat-scopes', action='store_true')
+argparser.add_argument('-O', dest='opt_level', type=int, choices=range(4), default=0)
+
+
+def main():
+    args = argparser.parse_args()
+    for name in args.sweeps:
+        if name not in SWEEPS:
+            argparser.error("unknown sweep: %s" % name)
+    driver.warm_up()
+    driver.get_parser(args.parser)
+    results = dict(python=platform.python_version(), machine=platform.machine(), cpus=os.cpu_count(),
+                   parser=args.parser, flat_scopes=args.flat_scopes, opt_level=args.opt_level, sweeps={})
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.sweeps or SWEEPS:
+            values = SWEEPS[name][:3] if args.quick else SWEEPS[name]
+            results['sweeps'][name] = sweep(name, values, args, tmp)
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            return 1 if compare(results, json.load(f), args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Walking deep and wide trees with the recursive Visitor and the
+explicit-stack Walker."""
+from common import *
+from core.visitor import *
+
+
+class RecursiveCounter(Visitor):
+    def __init__(self):
+        self.count = 0
+
+    @visitor(Node)
+    def visit(self, node):
+        self.count += 1
+        self.iterate(node)
+
+
+class Counter(Walker):
+    def __init__(self):
+        self.count = 0
+
+    @preorder(Node)
+    def enter(self, node):
+        self.count += 1
+
+
+def deep(depth):
+    """Scopes nested depth levels deep, as the scoper makes for lets."""
+    scope = Scope([Print(Number('0'))])
+    for i in range(depth):
+        scope = Scope([Print(Number(str(i))), scope])
+    return scope
+
+
+def wide(width):
+    return Block([Print(Number(str(i))) for i in range(width)])
+
+
+def walk(counter, tree):
+    try:
+        elapsed = timeit(lambda: counter().visit(tree), repeat=3)
+    except RecursionError:
+        return 'recursion limit'
+    counter = counter()
+    counter.visit(tree)
+    return '%.0f nodes/s' % (counter.count / elapsed)
+
+
+def main():
+    for name, tree in [('deep 200', deep(200)), ('deep 100000', deep(100000)),
+                       ('wide 100000', wide(100000))]:
+        print('%-12s recursive: %-16s walker: %s' % (name, walk(RecursiveCounter, tree), walk(Counter, tree)))
+
+    # Past the recursion limit, which nested scopes used to hit
+    lets = 1500
+    source = 'main() {\n%s    print(v%d);\n}\n' % (
+        ''.join('    let v%d = %s;\n' % (i, 'v%d + 1' % (i - 1) if i else '0') for i in range(lets)), lets - 1)
+    start = time.perf_counter()
+    codegen(analyze(source), ssa=True)
+    print('%d nested lets: analyzed and generated in %.3f s' % (lets, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
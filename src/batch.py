@@ -0,0 +1,66 @@
+from core.driver import compile_source, extensions, warm_up
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+argparser = argparse.ArgumentParser(description="Compile many source files in parallel.")
+argparser.add_argument('files', nargs='+')
+argparser.add_argument('-d', '--output-dir', default='.', help="directory for the output files")
+argparser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                       help="number of worker processes (default: one per CPU)")
+argparser.add_argument('--flat-scopes', action='store_true',
+                       help="use one scope per block instead of one per `let`")
+argparser.add_argument('--ssa', action='store_true',
+                       help="keep variables in registers instead of stack slots")
+argparser.add_argument('--emit', choices=['llvm', 'bc', 'obj'], default='llvm',
+                       help="output LLVM IR, bitcode or native object files")
+argparser.add_argument('-O', dest='opt_level', type=int, choices=range(4), default=0,
+                       help="optimization level")
+
+
+def output_path(args, path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(args.output_dir, name + extensions[args.emit])
+
+
+def compile_file(job):
+    """Compile one file, returning its path, the time it took and the
+    error it failed with, if any."""
+    path, output, options = job
+    start = time.perf_counter()
+    try:
+        with open(path) as f:
+            text_input = f.read()
+        compile_source(text_input, output, **options)
+    except Exception as e:
+        return path, time.perf_counter() - start, '%s: %s' % (type(e).__name__, e)
+    return path, time.perf_counter() - start, None
+
+
+def main():
+    args = argparser.parse_args()
+    outputs = [output_path(args, path) for path in args.files]
+    if len(set(outputs)) != len(outputs):
+        argparser.error("input files with the same name would overwrite each other's output")
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = dict(format=args.emit, opt_level=args.opt_level, ssa=args.ssa, flat_scopes=args.flat_scopes)
+    jobs = [(path, output, options) for path, output in zip(args.files, outputs)]
+
+    start = time.perf_counter()
+    failed = 0
+    # Each worker builds the lexer, parser and target machine once
+    with multiprocessing.get_context('fork').Pool(args.jobs, initializer=warm_up) as pool:
+        for path, elapsed, error in pool.imap_unordered(compile_file, jobs):
+            if error:
+                failed += 1
+                print('%8.3f s  %s: FAILED: %s' % (elapsed, path, error), file=sys.stderr)
+            else:
+                print('%8.3f s  %s' % (elapsed, path))
+    print('%d files, %d failed, %.3f s' % (len(jobs), failed, time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
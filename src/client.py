@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Deliberately imports nothing from core, so that it starts quickly
+
+
+def default_socket():
+    return os.environ.get('CORE_SOCKET') or os.path.join(tempfile.gettempdir(), 'core-%d.sock' % os.getuid())
+
+
+argparser = argparse.ArgumentParser(description="Compile a file with a running compile server.")
+argparser.add_argument('file')
+argparser.add_argument('--socket', default=default_socket(), help="the server's socket")
+argparser.add_argument('--flat-scopes', action='store_true',
+                       help="use one scope per block instead of one per `let`")
+argparser.add_argument('--debug', action='store_true', help="print the tree between passes and the IR")
+argparser.add_argument('--time-passes', nargs='?', const='table', choices=['table', 'json'],
+                       help="report time, memory and nodes visited of each stage, as a table or JSON")
+argparser.add_argument('--ssa', action='store_true',
+                       help="keep variables in registers instead of stack slots")
+argparser.add_argument('--emit', choices=['llvm', 'bc', 'obj'], default='llvm',
+                       help="output LLVM IR, bitcode or a native object file")
+argparser.add_argument('-O', dest='opt_level', type=int, choices=range(4), default=0,
+                       help="optimization level")
+argparser.add_argument('-o', '--output', help="output file (default: out.ll, out.bc or out.o)")
+argparser.add_argument('--incremental', action='store_true',
+                       help="only generate code for functions that changed since the last build")
+argparser.add_argument('-j', '--jobs', type=int, default=1,
+                       help="generate functions in this many worker processes")
+
+
+def main():
+    args = argparser.parse_args()
+    with open(args.file) as f:
+        text_input = f.read()
+    output = args.output or 'out' + {'llvm': '.ll', 'bc': '.bc', 'obj': '.o'}[args.emit]
+    # The server may run in another directory
+    request = dict(source=text_input, output=os.path.abspath(output), format=args.emit,
+                   opt_level=args.opt_level, ssa=args.ssa, flat_scopes=args.flat_scopes,
+                   jobs=args.jobs, incremental=args.incremental, debug=args.debug,
+                   time_passes=args.time_passes)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(args.socket)
+        except OSError as e:
+            sys.exit('cannot connect to the compile server at %s: %s' % (args.socket, e.strerror))
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as f:
+            response = json.load(f)
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['status']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,12 @@ from .lexer import *
 from .parser import *
 
 from .printer import print_tree
-from .scoper import scope
+from .scoper import scope, FlatScoper
 from .prim_typer import primitive_type
 from .resolver import resolve
 from .caster import cast
 from .type_propagator import propagate_types
-from .codegen import codegen
+from .folder import fold
+from .codegen import codegen, emit, emit_module, compile_object, parse_ir, run
+from .incremental import IncrementalBuild
+from .pass_manager import PassManager
@@ -1,18 +1,31 @@
+from .symbols import symbols as _symbols
+
+
 class Node:
+    __slots__ = ('_parent', '_ref', '_prev', '_next', 'ir')
+    # Only ListNode has positions that can go out of date
+    _stale = False
+
     def __init__(self):
         self._parent = None
-        self.selfref = None
+        self._ref = None
+        self._prev = None
+        self._next = None
+
+    @property
+    def selfref(self):
+        """Name of this node in its DictNode parent, or index in its ListNode parent."""
+        parent = self._parent
+        if parent and parent._stale:
+            parent._reindex()
+        return self._ref
 
     def delete(self):
         self.replace(None)
 
     def replace(self, *new):
         if self._parent:
-            parent = self._parent
-            selfref = self.selfref
-            parent[selfref] = new[0]
-            for i in range(1, len(new)):
-                parent.add_child(selfref + i, new[i])
+            self._parent._replace_child(self, new)
         return self
 
     def unlink(self):
@@ -20,133 +33,230 @@ class Node:
 
     def next(self):
         if self._parent:
-            try:
-                return self._parent[self.selfref + 1]
-            except TypeError:
-                pass
+            return self._next
 
     def __iter__(self):
         return iter([])
 
 
+def _symbol(name):
+    """The symbol of a name, which may already be one."""
+    return name if type(name) is int else _symbols.intern(name)
+
+
+class Named:
+    """Mixin for nodes with an identifier, which they keep as its symbol."""
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return _symbols.names[self.symbol]
+
+
 class DictNode(Node):
+    # Names of the child slots, in iteration order
+    _fields = ()
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
-        self._children = {}
+        for name in self._fields:
+            object.__setattr__(self, name, None)
 
     def add_child(self, name, node):
-        self._children[name] = None
         self[name] = node
 
     def __setitem__(self, name, child):
         del self[name]
         if child:
             child.unlink()
-            self._children[name] = child
             child._parent = self
-            child.selfref = name
-            super().__setattr__(name, child)
+            child._ref = name
+            child._prev = child._next = None
+            object.__setattr__(self, name, child)
 
     def __getitem__(self, name):
-        return self._children[name]
+        return getattr(self, name)
 
     def __delitem__(self, name):
-        old = self._children[name]
+        old = getattr(self, name)
         if old:
             old._parent = None
-            old.selfref = None
-        super().__setattr__(name, None)
+            old._ref = None
+        object.__setattr__(self, name, None)
+
+    def _replace_child(self, old, new):
+        self[old._ref] = new[0]
 
     def __iter__(self):
-        for child in self._children.values():
+        for name in self._fields:
+            child = getattr(self, name)
             if child: yield child
 
     def __setattr__(self, name, child):
-        if hasattr(self, '_children') and name in self._children:
+        if name in self._fields:
             self[name] = child
         else:
-            super().__setattr__(name, child)
+            object.__setattr__(self, name, child)
 
 
 class ListNode(Node):
+    # Children form a doubly linked list; positions are only recomputed
+    # (together with an array for indexing) when somebody asks for them.
+    # Changing the list through its children (replace, delete, unlink)
+    # and appending take constant time, and so do indexing, inserting and
+    # deleting at either end. Any other position costs a linear rebuild
+    # of the array after each change, so passes work relative to nodes.
+    __slots__ = ('_head', '_tail', '_array', '_stale')
+
     def __init__(self, children=[]):
         super().__init__()
-        self._children = []
+        self._head = None
+        self._tail = None
+        self._array = []
+        self._stale = False
         self.add_children(*children)
 
+    def _reindex(self):
+        array = []
+        child = self._head
+        while child:
+            child._ref = len(array)
+            array.append(child)
+            child = child._next
+        self._array = array
+        self._stale = False
+
+    def _link(self, child, prev):
+        """Insert a child after prev, or at the front if prev is None."""
+        child.unlink()
+        child._parent = self
+        child._prev = prev
+        child._next = prev._next if prev else self._head
+        if child._next:
+            child._next._prev = child
+        else:
+            self._tail = child
+        if prev:
+            prev._next = child
+        else:
+            self._head = child
+        if child is self._tail and not self._stale:
+            child._ref = len(self._array)
+            self._array.append(child)
+        else:
+            self._stale = True
+
+    def _remove(self, child):
+        # child._next is kept so that iteration can continue past it
+        if child._prev:
+            child._prev._next = child._next
+        else:
+            self._head = child._next
+        if child._next:
+            child._next._prev = child._prev
+        else:
+            self._tail = child._prev
+        child._parent = None
+        child._ref = None
+        child._prev = None
+        self._stale = True
+
+    def _replace_child(self, old, new):
+        prev = old._prev
+        after = old._next
+        self._remove(old)
+        for child in new:
+            if child:
+                self._link(child, prev)
+                prev = child
+        if old._parent is not self:
+            # Resume iteration where an index-based iterator would
+            old._next = new[0]._next if new and new[0] else after
+
     def add_child(self, index, child=None):
         if not child:
             index, child = child, index
         child.unlink()
-        child._parent = self
-        if index:
-            self._children.insert(index, child)
-            for i, child in enumerate(self._children[index:]):
-                child.selfref = index + i
+        if index is None:
+            self._link(child, self._tail)
+            return
+        if index == 0:
+            self._link(child, None)
+            return
+        if self._stale:
+            self._reindex()
+        if index >= len(self._array):
+            self._link(child, self._tail)
         else:
-            child.selfref = len(self._children)
-            self._children.append(child)
+            self._link(child, self._array[index]._prev)
 
     def add_children(self, *children):
         for child in children:
             self.add_child(child)
 
     def __setitem__(self, index, child):
-        if index < 0: index += len(self._children)
-        if child:
-            self._children[index]._parent = None
-            self._children[index].selfref = None
-            self._children[index] = child
-            child._parent = self
-            child.selfref = index
-        else:
-            del self[index]
+        self[index].replace(child)
 
     def __getitem__(self, index):
-        return self._children[index]
+        # The ends are known without positions
+        if index == 0 and self._head:
+            return self._head
+        if index == -1 and self._tail:
+            return self._tail
+        if self._stale:
+            self._reindex()
+        return self._array[index]
 
     def __delitem__(self, index):
-        if index < 0: index += len(self._children)
-        old = self._children[index]
-        if old:
-            old._parent = None
-            old.selfref = None
-        del self._children[index]
-        for i, child in enumerate(self._children[index:]):
-            child.selfref = index + i
+        self[index].unlink()
 
     def __iter__(self):
-        return iter(self._children)
+        child = self._head
+        while child:
+            yield child
+            # If the child was removed, this is where it used to continue
+            child = child._next
+            if child and child._parent is not self:
+                break
 
 
 class Number(DictNode):
+    __slots__ = ('value', 'type')
+
     def __init__(self, value):
         super().__init__()
         self.value = value
-        self.add_child('type', None)
+        self.type = None
 
 
 class BinaryOp(DictNode):
+    _fields = ('left', 'right')
+    __slots__ = _fields + ('type',)
+
     def __init__(self, left, right):
         super().__init__()
         self.add_child('left', left)
         self.add_child('right', right)
 
 
-class Sum(BinaryOp): pass
-class Sub(BinaryOp): pass
-class Mul(BinaryOp): pass
-class Div(BinaryOp): pass
-class Mod(BinaryOp): pass
-class Eq(BinaryOp): pass
-class Neq(BinaryOp): pass
-class Gt(BinaryOp): pass
-class Lt(BinaryOp): pass
-class Geq(BinaryOp): pass
-class Leq(BinaryOp): pass
+class Sum(BinaryOp): __slots__ = ()
+class Sub(BinaryOp): __slots__ = ()
+class Mul(BinaryOp): __slots__ = ()
+class Div(BinaryOp): __slots__ = ()
+class Mod(BinaryOp): __slots__ = ()
+class Eq(BinaryOp): __slots__ = ()
+class Neq(BinaryOp): __slots__ = ()
+class Gt(BinaryOp): __slots__ = ()
+class Lt(BinaryOp): __slots__ = ()
+class Geq(BinaryOp): __slots__ = ()
+class Leq(BinaryOp): __slots__ = ()
 
 
 class If(DictNode):
+    _fields = ('predicate', 'ifblock', 'elseblock')
+    __slots__ = _fields
+
     def __init__(self, predicate, ifblock, elseblock=None):
         super().__init__()
         self.add_child('predicate', predicate)
@@ -155,24 +265,33 @@ class If(DictNode):
 
 
 class Print(DictNode):
+    _fields = ('value',)
+    __slots__ = _fields
+
     def __init__(self, value):
         super().__init__()
         self.add_child('value', value)
 
 
 class Block(ListNode):
+    __slots__ = ()
+
     def __init__(self, statements):
         super().__init__()
         self.add_children(*statements)
 
 
 class ArgumentList(ListNode):
+    __slots__ = ()
+
     def __init__(self, expressions):
         super().__init__()
         self.add_children(*expressions)
 
 
 class VariableList(ListNode):
+    __slots__ = ('count',)
+
     def __init__(self, parameters):
         super().__init__()
         self.add_children(*parameters)
@@ -180,6 +299,9 @@ class VariableList(ListNode):
 
 
 class Call(DictNode):
+    _fields = ('function', 'arguments')
+    __slots__ = _fields
+
     def __init__(self, function, arguments):
         super().__init__()
         self.add_child('function', function)
@@ -187,101 +309,161 @@ class Call(DictNode):
 
 
 class Cast(DictNode):
+    _fields = ('argument',)
+    __slots__ = _fields + ('type',)
+
     def __init__(self, type, argument):
         super().__init__()
-        self.add_child('type', type)
+        self.type = type
         self.add_child('argument', argument)
 
 
-class Function(DictNode):
-    def __init__(self, name, block, parameters=VariableList([])):
+class Function(Named, DictNode):
+    _fields = ('parameters', 'block')
+    __slots__ = _fields + ('symbol', 'type')
+
+    def __init__(self, name, block, parameters=None):
         super().__init__()
-        self.name = name
-        self.add_child('parameters', parameters)
+        self.symbol = _symbol(name)
+        self.type = None
+        self.add_child('parameters', parameters if parameters is not None else VariableList([]))
         self.add_child('block', block)
 
 
-class FuncDecl(DictNode):
-    def __init__(self, name, block, parameters=VariableList([])):
+class FuncDecl(Named, DictNode):
+    _fields = ('parameters', 'block')
+    __slots__ = _fields + ('symbol', 'type')
+
+    def __init__(self, name, block, parameters=None):
         super().__init__()
-        self.name = name
-        self.add_child('parameters', parameters)
+        self.symbol = _symbol(name)
+        self.type = None
+        self.add_child('parameters', parameters if parameters is not None else VariableList([]))
         self.add_child('block', block)
 
 
 
 class Assignment(DictNode):
+    _fields = ('lhs', 'rhs')
+    __slots__ = _fields + ('type',)
+
     def __init__(self, lhs, rhs):
         super().__init__()
         self.add_child('lhs', lhs)
         self.add_child('rhs', rhs)
 
 
-class VarDecl(DictNode):
+class VarDecl(Named, DictNode):
+    _fields = ('expression',)
+    __slots__ = _fields + ('symbol',)
+
     def __init__(self, name, expression):
         super().__init__()
-        self.name = name
+        self.symbol = _symbol(name)
         self.add_child('expression', expression)
 
 
-class Variable(DictNode):
-    def __init__(self, name, type=None):
+class Variable(Named, DictNode):
+    # The type as written, for parameters
+    _fields = ('annotation',)
+    __slots__ = _fields + ('symbol', 'type')
+
+    def __init__(self, name, annotation=None):
         super().__init__()
-        self.name = name
-        self.add_child('type', type)
+        self.symbol = _symbol(name)
+        self.type = None
+        self.add_child('annotation', annotation)
+
 
+class Type(Named, DictNode):
+    """An integer type. Types are only made by the type table, which has one
+    of each, so nodes share them and types are equal only if identical."""
+    __slots__ = ('symbol',)
 
-class Type(DictNode):
     def __init__(self, name):
         super().__init__()
-        self.name = name
+        self.symbol = _symbol(name)
+
 
+class BasicType(Named, DictNode):
+    __slots__ = ('symbol',)
 
-class BasicType(DictNode):
     def __init__(self, name):
         super().__init__()
-        self.name = name
+        self.symbol = _symbol(name)
 
 
-class FunctionType(DictNode):
+class FunctionType(Named, DictNode):
+    """The type of a function, for its parameter types. Functions return
+    nothing, so ret_type is None."""
+    __slots__ = ('symbol', 'arg_types', 'ret_type')
+
     def __init__(self, name, arg_types, ret_type):
         super().__init__()
-        self.name = name
+        self.symbol = _symbol(name)
         self.arg_types = arg_types
         self.ret_type = ret_type
 
 
 class Scope(ListNode):
+    """Binds names to nodes. Bindings are keyed on symbols, not names."""
+    __slots__ = ('names', 'declared', 'parent_scope', 'lookups')
+
     def __init__(self, children):
         super().__init__()
         self.add_children(*children)
         self.names = {}
+        # Variables declared so far, in statement order
+        self.declared = {}
         self.parent_scope = None
+        # Names resolved from here before, with what they resolved to
+        self.lookups = {}
+
+    def resolve(self, symbol):
+        """Find what a name refers to from this scope. Every scope the
+        search passes through caches the result, until the name is bound
+        there or the cache is cleared, so the next search from this scope
+        or one nested in it stops there."""
+        missed = []
+        scope = self
+        while scope:
+            node = scope.lookups.get(symbol)
+            if node is None:
+                node = scope.declared.get(symbol) or scope.names.get(symbol)
+            if node is not None:
+                for passed in missed:
+                    passed.lookups[symbol] = node
+                return node
+            missed.append(scope)
+            scope = scope.parent_scope
+        raise KeyError(_symbols.names[symbol])
+
+    def register(self, symbol, node):
+        self.names[symbol] = node
+        self.lookups.pop(symbol, None)
+
+    def declare(self, symbol, node):
+        """Make a variable visible from this point of the scope onwards."""
+        self.declared[symbol] = node
+        self.lookups.pop(symbol, None)
+
+
+class Reference(Named, DictNode):
+    __slots__ = ('symbol', 'target', 'type')
 
-    def resolve(self, name):
-        try:
-            return self.names[name]
-        except KeyError as e:
-            if self.parent_scope:
-                return self.parent_scope.resolve(name)
-            raise e
-
-    def register(self, name, node):
-        self.names[name] = node
-
-
-class Reference(DictNode):
     def __init__(self, ref):
         super().__init__()
-        if isinstance(ref, str):
-            self.name = ref
+        if isinstance(ref, (str, int)):
+            self.symbol = _symbol(ref)
             self.target = None
         else:
             self.target = ref
-            self.name = self.target.name
+            self.symbol = self.target.symbol
         self.type = None
 
 
 class Module(ListNode):
+    __slots__ = ('printf', 'fmtstr', 'module')
+
     def __init__(self):
         super().__init__()
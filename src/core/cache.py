@@ -0,0 +1,79 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+# Bump whenever the layout of cached data changes
+VERSION = 2
+
+
+def cache_dir():
+    """Get the directory used for the on-disk compiler cache."""
+    path = os.environ.get('CORE_CACHE_DIR')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'core')
+
+
+def enabled():
+    return os.environ.get('CORE_NO_CACHE') is None
+
+
+def digest(*parts):
+    """Hash the reprs of all parts into a hex cache key."""
+    hasher = hashlib.sha256()
+    hasher.update(str(VERSION).encode())
+    for part in parts:
+        hasher.update(repr(part).encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+_compiler_hash = None
+
+def compiler_hash():
+    """Hash of the compiler's own sources, so that nothing compiled by a
+    different version of it is reused."""
+    global _compiler_hash
+    if not _compiler_hash:
+        hasher = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))):
+            with open(path, 'rb') as f:
+                hasher.update(f.read())
+        _compiler_hash = hasher.hexdigest()
+    return _compiler_hash
+
+
+def _path(kind, key):
+    return os.path.join(cache_dir(), '%s-%s-%s' % (kind, VERSION, key))
+
+
+def load(kind, key):
+    """Load the bytes cached under a key, or return None if there are none.
+    Entries are plain bytes that their users decode, never pickles, so
+    that loading one cannot run code."""
+    if not enabled():
+        return None
+    try:
+        with open(_path(kind, key), 'rb') as f:
+            checksum, data = f.read(32), f.read()
+    except OSError:
+        return None
+    # A truncated or corrupted entry is a miss
+    return data if hashlib.sha256(data).digest() == checksum else None
+
+
+def store(kind, key, data):
+    """Atomically store bytes in the cache. Failures are ignored."""
+    if not enabled():
+        return
+    path = _path(kind, key)
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            f.write(hashlib.sha256(data).digest())
+            f.write(data)
+        os.replace(f.name, path)
+    except OSError:
+        pass
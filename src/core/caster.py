@@ -2,12 +2,11 @@ from .visitor import *
 from .ast import *
 
 
-class Caster(Visitor):
-    @visitor(Call)
-    def visit(self, node):
-        self.iterate(node)
+class Caster(Walker):
+    @postorder(Call)
+    def leave(self, node):
         if isinstance(node.function.target, Type):
-            node.replace(Cast(node.function, *node.arguments))
+            node.replace(Cast(node.function.target, *node.arguments))
 
 
 def cast(root):
@@ -1,41 +1,25 @@
+import ctypes
+import llvmlite
 from llvmlite import ir, binding
 from .visitor import *
 from .ast import *
+from .instrument import stage
 
 
-class CodegenGlobal(Visitor):
-    @visitor(VariableList)
-    def visit(self, node):
-        self.iterate(node)
-        node.ir = [var.type.ir for var in node]
-
-    @visitor(Reference)
-    def visit(self, node):
-        node.ir = node.target.ir
-
-    @visitor(Type)
-    def visit(self, node):
-        match node.name:
-            case 'int8': node.ir = ir.IntType(8)
-            case 'int16': node.ir = ir.IntType(16)
-            case 'int32': node.ir = ir.IntType(32)
-            case 'int64': node.ir = ir.IntType(64)
-        #elif node.name == 'fn()':
-        #    node.ir = ir.FunctionType(ir.VoidType(), node.parameters.ir, False)
-
-    @visitor(Function)
-    def visit(self, node):
-        self.visit(node.parameters)
-        func_type = ir.FunctionType(ir.VoidType(), node.parameters.ir, False)
-        function = ir.Function(self.module, func_type, name=node.name)
-        for i, arg in enumerate(function.args):
-            arg.name = node.parameters[i].name
-            node.parameters[i].ir = arg
+class CodegenGlobal(Walker):
+    @preorder(Function)
+    def enter(self, node):
+        # Types carry their LLVM types already
+        function = ir.Function(self.module, node.type.ir, name=node.name)
+        for param, arg in zip(node.parameters, function.args):
+            arg.name = param.name
+            param.ir = arg
         node.ir = function
+        return SKIP
 
-    @visitor(Module)
-    def visit(self, node):
-        self.module = ir.Module(name="main_module")
+    def declare_runtime(self, node, name="main_module"):
+        """Start a new IR module with what every function body may use."""
+        self.module = ir.Module(name=name)
         self.module.triple = binding.get_default_triple()
 
         printf_ty = ir.FunctionType(ir.IntType(32), [ir.IntType(8).as_pointer()], var_arg=True)
@@ -48,157 +32,332 @@ class CodegenGlobal(Visitor):
         node.fmtstr.linkage = 'internal'
         node.fmtstr.global_constant = True
         node.fmtstr.initializer = c_fmt
-
-        self.iterate(node)
         node.module = self.module
 
+    @preorder(Module)
+    def enter(self, node):
+        self.declare_runtime(node)
+
 
-class CodegenLocal(Visitor):
+class CodegenLocal(Walker):
     def __init__(self):
         self.fmtstr = None
 
-    @visitor(Number)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Number)
+    def leave(self, node):
         node.ir = ir.Constant(node.type.ir, int(node.value))
 
-    @visitor(Sum)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Sum)
+    def leave(self, node):
         node.ir = self.builder.add(node.left.ir, node.right.ir)
 
-    @visitor(Sub)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Sub)
+    def leave(self, node):
         node.ir = self.builder.sub(node.left.ir, node.right.ir)
 
-    @visitor(Mul)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Mul)
+    def leave(self, node):
         node.ir = self.builder.mul(node.left.ir, node.right.ir)
 
-    @visitor(Div)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Div)
+    def leave(self, node):
         node.ir = self.builder.sdiv(node.left.ir, node.right.ir)
 
-    @visitor(Mod)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Mod)
+    def leave(self, node):
         node.ir = self.builder.srem(node.left.ir, node.right.ir)
 
-    @visitor(Eq)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Eq)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('==', node.left.ir, node.right.ir)
 
-    @visitor(Neq)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Neq)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('!=', node.left.ir, node.right.ir)
 
-    @visitor(Gt)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Gt)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('>', node.left.ir, node.right.ir)
 
-    @visitor(Lt)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Lt)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('<', node.left.ir, node.right.ir)
 
-    @visitor(Geq)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Geq)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('>=', node.left.ir, node.right.ir)
 
-    @visitor(Leq)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Leq)
+    def leave(self, node):
         node.ir = self.builder.icmp_signed('<=', node.left.ir, node.right.ir)
 
-    @visitor(Print)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Print)
+    def leave(self, node):
         fmt_arg = self.builder.bitcast(self.fmtstr, ir.IntType(8).as_pointer())
         self.builder.call(self.printf, [fmt_arg, node.value.ir])
 
-    @visitor(If)
-    def visit(self, node):
+    @preorder(If)
+    def enter(self, node):
         self.visit(node.predicate)
         with self.builder.if_then(node.predicate.ir) as then:
             self.visit(node.ifblock)
+        return SKIP
 
-    @visitor(Call)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Call)
+    def leave(self, node):
         self.builder.call(node.function.ir, node.arguments.ir)
 
-    @visitor(Cast)
-    def visit(self, node):
-        self.iterate(node)
-        print(node.type.ir.width)
+    @postorder(Cast)
+    def leave(self, node):
         if node.type.ir.width < node.argument.ir.type.width:
             node.ir = self.builder.trunc(node.argument.ir, node.type.ir)
         else:
             node.ir = self.builder.sext(node.argument.ir, node.type.ir)
 
-    @visitor(ArgumentList)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(ArgumentList)
+    def leave(self, node):
         r = [expr.ir for expr in node]
         for i in range(len(r)): # TODO find a better way to do this
             if isinstance(r[i], ir.instructions.AllocaInstr):
                 r[i] = self.builder.load(r[i])
         node.ir = r
 
-    @visitor(Variable)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Variable)
+    def leave(self, node):
         node.ir = self.builder.alloca(node.type.ir, name=node.name)
 
-    @visitor(Assignment)
-    def visit(self, node):
-        self.iterate(node)
+    @postorder(Assignment)
+    def leave(self, node):
         self.builder.store(node.rhs.ir, node.lhs.ir)
 
-    @visitor(Reference)
-    def visit(self, node):
+    @preorder(Reference)
+    def enter(self, node):
         node.ir = node.target.ir
 
-    @visitor(Function)
-    def visit(self, node):
-        if not node.block: return
-        block = node.ir.append_basic_block()
-        self.builder = ir.IRBuilder(block)
-        self.visit(node.block)
-        self.builder.ret_void()
+    @preorder(Function)
+    def enter(self, node):
+        if node.block:
+            block = node.ir.append_basic_block()
+            self.builder = ir.IRBuilder(block)
+            self.visit(node.block)
+            self.builder.ret_void()
+        return SKIP
 
-    @visitor(Module)
-    def visit(self, node):
+    def use_runtime(self, node):
         self.module = node.module
         self.printf = node.printf
         self.fmtstr = node.fmtstr
-        self.iterate(node)
-        return node.module
 
+    @preorder(Module)
+    def enter(self, node):
+        self.use_runtime(node)
 
-def codegen(root):
+
+class CodegenSSA(CodegenLocal):
+    """Maps each variable straight to the IR value assigned to it instead
+    of a stack slot, and joins values that differ between branches with
+    phi nodes."""
+
+    def __init__(self):
+        super().__init__()
+        # Current value of each variable
+        self.values = {}
+
+    def _merge(self, before, branches):
+        """Add phis for variables whose value depends on the branch taken.
+        branches are (values, block) pairs for each incoming edge."""
+        for var in before:
+            incoming = [(values[var], block) for values, block in branches]
+            if any(value is not before[var] for value, _ in incoming):
+                phi = self.builder.phi(var.type.ir, name=var.name)
+                for value, block in incoming:
+                    phi.add_incoming(value, block)
+                self.values[var] = phi
+
+    @preorder(If)
+    def enter(self, node):
+        self.visit(node.predicate)
+        before = dict(self.values)
+        if not node.elseblock:
+            entry = self.builder.block
+            with self.builder.if_then(node.predicate.ir):
+                self.visit(node.ifblock)
+                then = (self.values, self.builder.block)
+            self._merge(before, [then, (before, entry)])
+        else:
+            with self.builder.if_else(node.predicate.ir) as (then_block, else_block):
+                with then_block:
+                    self.visit(node.ifblock)
+                    then = (self.values, self.builder.block)
+                self.values = dict(before)
+                with else_block:
+                    self.visit(node.elseblock)
+                    otherwise = (self.values, self.builder.block)
+            self._merge(before, [then, otherwise])
+        self.values = {var: self.values.get(var, before[var]) for var in before}
+        return SKIP
+
+    @postorder(ArgumentList)
+    def leave(self, node):
+        node.ir = [expr.ir for expr in node]
+
+    @postorder(Variable)
+    def leave(self, node):
+        # Only the variable's own initializer can see it before it is assigned
+        self.values[node] = ir.Constant(node.type.ir, ir.Undefined)
+
+    @postorder(Assignment)
+    def leave(self, node):
+        self.values[node.lhs.target] = node.rhs.ir
+
+    @preorder(Reference)
+    def enter(self, node):
+        if node.target in self.values:
+            node.ir = self.values[node.target]
+        else:
+            node.ir = node.target.ir
+
+
+def _create_target_machine():
     binding.initialize()
     binding.initialize_native_target()
     binding.initialize_native_asmprinter()
-    target = binding.Target.from_default_triple()
-    target_machine = target.create_target_machine()
-    backing_mod = binding.parse_assembly("")
-    engine = binding.create_mcjit_compiler(backing_mod, target_machine)
-    CodegenGlobal().visit(root)
-    module = CodegenLocal().visit(root)
-    llvm_ir = str(module)
-    print(llvm_ir)
-    mod = binding.parse_assembly(llvm_ir)
-    mod.verify()
-    engine.add_module(mod)
-    engine.finalize_object()
-    engine.run_static_constructors()
-    mod.engine = engine # so engine doesn't get collected. TODO: make this cleaner
+    return binding.Target.from_default_triple().create_target_machine(reloc='pic')
+
+
+# Created on first use, then shared
+_target_machine = None
+
+def target_machine():
+    """Get the native target machine, initializing LLVM if needed."""
+    global _target_machine
+    if not _target_machine:
+        _target_machine = _create_target_machine()
+    return _target_machine
+
+
+def target_key():
+    """What cached bitcode and objects depend on besides the compiler's own
+    sources: the llvmlite and LLVM versions and the target."""
+    machine = target_machine()
+    return llvmlite.__version__, binding.llvm_version_info, machine.triple, str(machine.target_data)
+
+
+def codegen(root, debug=False, ssa=False):
+    """Generate the IR of an analyzed module, as text."""
+    with stage('codegen'):
+        CodegenGlobal().visit(root)
+        (CodegenSSA() if ssa else CodegenLocal()).visit(root)
+        llvm_ir = str(root.module)
+    if debug:
+        print(llvm_ir)
+    return llvm_ir
+
+
+def codegen_function(root, function, callees, ssa=False, debug=False):
+    """Generate a module with a single function body, declaring the
+    functions it calls. Returns the IR text."""
+    with stage('codegen'):
+        generator = CodegenGlobal()
+        generator.declare_runtime(root, name=function.name)
+        for callee in dict.fromkeys([function, *callees]):
+            generator.visit(callee)
+        local = CodegenSSA() if ssa else CodegenLocal()
+        local.use_runtime(root)
+        local.visit(function)
+        llvm_ir = str(generator.module)
+    if debug:
+        print(llvm_ir)
+    return llvm_ir
+
+
+def parse_ir(llvm_ir):
+    """Parse and verify IR text into an LLVM module."""
+    with stage('parse_assembly'):
+        mod = binding.parse_assembly(llvm_ir)
+    with stage('verify'):
+        mod.verify()
     return mod
+
+
+# Inliner thresholds for each -O level, as clang uses them
+_inlining_thresholds = {1: 225, 2: 225, 3: 275}
+
+def optimize(mod, level):
+    """Run the standard LLVM pipeline (SROA/mem2reg, instcombine, GVN,
+    inlining, loop passes, ...) for -O<level> on a module."""
+    if not level:
+        return mod
+    with stage('optimize'):
+        _optimize(mod, level)
+    return mod
+
+
+def _optimize(mod, level):
+    machine = target_machine()
+    mod.triple = machine.triple
+    mod.data_layout = str(machine.target_data)
+    builder = binding.create_pass_manager_builder()
+    builder.opt_level = level
+    builder.inlining_threshold = _inlining_thresholds[level]
+    builder.loop_vectorize = level >= 2
+    builder.slp_vectorize = level >= 2
+    function_passes = binding.create_function_pass_manager(mod)
+    module_passes = binding.create_module_pass_manager()
+    machine.add_analysis_passes(function_passes)
+    machine.add_analysis_passes(module_passes)
+    builder.populate(function_passes)
+    builder.populate(module_passes)
+    function_passes.initialize()
+    for function in mod.functions:
+        function_passes.run(function)
+    function_passes.finalize()
+    module_passes.run(mod)
+
+
+def compile_object(mod, opt_level=0):
+    """Compile an LLVM module to the contents of a native object file."""
+    optimize(mod, opt_level)
+    with stage('emit_object'):
+        return target_machine().emit_object(mod)
+
+
+def run(obj, name='main'):
+    """Load a native object in-process and call one of its functions."""
+    with stage('finalize_object'):
+        # The engine takes ownership of its target machine and frees it
+        # along with itself, so it cannot have the shared one
+        engine = binding.create_mcjit_compiler(binding.parse_assembly(""), _create_target_machine())
+        engine.add_object_file(binding.ObjectFileRef.from_data(obj))
+        engine.finalize_object()
+        engine.run_static_constructors()
+    address = engine.get_function_address(name)
+    if not address:
+        raise LookupError("no function %s() to run" % name)
+    function = ctypes.CFUNCTYPE(None)(address)
+    function()
+    # The generated code prints through the C library's buffered stdout
+    ctypes.CDLL(None).fflush(None)
+
+
+def emit(llvm_ir, path, format='llvm', opt_level=0):
+    """Write IR text, bitcode ('bc') or a native object file ('obj')."""
+    if format == 'llvm' and not opt_level:
+        with stage('write'), open(path, 'w') as f:
+            f.write(llvm_ir)
+        return
+    emit_module(parse_ir(llvm_ir), path, format, opt_level)
+
+
+def emit_module(mod, path, format='llvm', opt_level=0):
+    """Like emit, for an already parsed module."""
+    if format == 'obj':
+        data = compile_object(mod, opt_level)
+    elif format in ('llvm', 'bc'):
+        optimize(mod, opt_level)
+        with stage('emit_' + format):
+            data = str(mod).encode() if format == 'llvm' else mod.as_bitcode()
+    else:
+        raise ValueError(format)
+    with stage('write'), open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,92 @@
+import sys
+from .lexer import Lexer
+from .parser import Parser
+from .pratt import PrattParser
+from .scoper import FlatScoper
+from .pass_manager import PassManager
+from .codegen import codegen, emit, emit_module, parse_ir, target_machine
+from .incremental import IncrementalBuild
+from .stream import StreamingBuild
+from .instrument import stage
+from . import cache, instrument, serialize
+
+# Output file extension for each emitted format
+extensions = {'llvm': '.ll', 'bc': '.bc', 'obj': '.o'}
+
+
+# Parsers by name, built once per process
+_parsers = {}
+
+def get_parser(kind='rply'):
+    """Get the table driven 'rply' parser or the hand-written 'pratt' one."""
+    if kind not in _parsers:
+        if kind == 'pratt':
+            _parsers[kind] = PrattParser()
+        else:
+            pg = Parser()
+            pg.parse()
+            _parsers[kind] = pg.get_parser()
+    return _parsers[kind]
+
+
+def warm_up():
+    """Build everything that is shared between compilations up front."""
+    Lexer().get_lexer()
+    get_parser()
+    target_machine()
+
+
+def analyze(text_input, flat_scopes=False, debug=False, parser='rply'):
+    """Parse and analyze source text, ready for code generation. Analyzed
+    trees are cached, unless the passes are to be debugged or instrumented."""
+    reuse = not (debug or instrument.active())
+    key = cache.digest(cache.compiler_hash(), text_input, flat_scopes)
+    data = cache.load('ast', key) if reuse else None
+    if data:
+        try:
+            return serialize.load(data)
+        except (ValueError, EOFError, TypeError):
+            pass
+    tokens = Lexer().get_lexer().lex(text_input)
+    if instrument.active():
+        # Lexing is interleaved with parsing otherwise
+        with stage('lex'):
+            tokens = list(tokens)
+    with stage('parse'):
+        module = get_parser(parser).parse(iter(tokens))
+    visitors = {'scope': FlatScoper} if flat_scopes else {}
+    PassManager(debug=debug, visitors=visitors).run(module)
+    if reuse:
+        cache.store('ast', key, serialize.dump(module))
+    return module
+
+
+def compile_module(module, ssa=False, opt_level=0, jobs=1, incremental=False, debug=False):
+    """Generate an LLVM module for an analyzed tree. Function by function
+    builds are optimized per function, the result as a whole is not."""
+    if incremental or jobs > 1:
+        build = IncrementalBuild(ssa=ssa, opt_level=opt_level, jobs=jobs,
+                                 reuse=incremental, debug=debug)
+        mod = build.build(module)
+        if debug:
+            print('generated: ' + ', '.join(build.compiled), file=sys.stderr)
+        return mod
+    return parse_ir(codegen(module, debug=debug, ssa=ssa))
+
+
+def compile_source(text_input, output, format='llvm', opt_level=0, ssa=False, flat_scopes=False,
+                   jobs=1, incremental=False, debug=False, parser='rply'):
+    """Compile source text all the way to an output file."""
+    module = analyze(text_input, flat_scopes, debug, parser)
+    if incremental or jobs > 1:
+        mod = compile_module(module, ssa, opt_level, jobs, incremental, debug)
+        emit_module(mod, output, format, opt_level)
+    else:
+        emit(codegen(module, debug=debug, ssa=ssa), output, format, opt_level)
+
+
+def compile_stream(path, output, format='llvm', opt_level=0, ssa=False, flat_scopes=False, debug=False):
+    """Compile a file to an output file one function at a time, without
+    ever reading all of it into memory."""
+    mod = StreamingBuild(ssa, opt_level, flat_scopes, debug).build(path)
+    emit_module(mod, output, format, opt_level)
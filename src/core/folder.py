@@ -0,0 +1,78 @@
+import operator
+from .visitor import *
+from .ast import *
+from .type_table import types
+
+
+def _wrap(value, bits):
+    """Wrap an integer around to a signed value of the given width."""
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+def _div(a, b):
+    # Rounds towards zero, like sdiv
+    if b == 0: return None
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+def _mod(a, b):
+    # Takes the sign of the dividend, like srem
+    if b == 0: return None
+    return a - b * _div(a, b)
+
+_operators = {
+    Sum: operator.add,
+    Sub: operator.sub,
+    Mul: operator.mul,
+    Div: _div,
+    Mod: _mod,
+    Eq: operator.eq,
+    Neq: operator.ne,
+    Gt: operator.gt,
+    Lt: operator.lt,
+    Geq: operator.ge,
+    Leq: operator.le,
+}
+
+_comparisons = (Eq, Neq, Gt, Lt, Geq, Leq)
+
+
+class ConstantFolder(Walker):
+    """Evaluates operations on constants and removes branches that can
+    never be taken."""
+
+    def _constant(self, node, value, type):
+        number = Number(str(_wrap(int(value), type.ir.width)))
+        number.type = type
+        node.replace(number)
+
+    @postorder(BinaryOp)
+    def leave(self, node):
+        if isinstance(node.left, Number) and isinstance(node.right, Number):
+            bits = node.left.type.ir.width
+            left = _wrap(int(node.left.value), bits)
+            right = _wrap(int(node.right.value), bits)
+            value = _operators[type(node)](left, right)
+            # Leave division overflow to the target
+            if value is not None and (type(node) is not Div or value == _wrap(value, bits)):
+                # Comparisons are i1 in the IR, folded or not
+                self._constant(node, value, types.get('bool') if isinstance(node, _comparisons) else node.type)
+
+    @postorder(Cast)
+    def leave(self, node):
+        if isinstance(node.argument, Number):
+            bits = node.argument.type.ir.width
+            self._constant(node, _wrap(int(node.argument.value), bits), node.type)
+
+    @postorder(If)
+    def leave(self, node):
+        if isinstance(node.predicate, Number):
+            taken = node.ifblock if int(node.predicate.value) else node.elseblock
+            if taken:
+                node.replace(taken)
+            else:
+                node.delete()
+
+
+def fold(root):
+    ConstantFolder().visit(root)
@@ -0,0 +1,135 @@
+import hashlib
+import multiprocessing
+from llvmlite import binding
+from .visitor import *
+from .ast import *
+from .codegen import codegen_function, parse_ir, optimize, target_key
+from .instrument import stage
+from . import cache
+
+
+def _type_name(node):
+    type = getattr(node, 'type', None)
+    return type.name if type else ''
+
+
+class Fingerprint(Walker):
+    """Hashes everything about a function that affects its code: its
+    analyzed tree and the signatures of the functions it calls."""
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.callees = {}
+
+    def _add(self, *parts):
+        for part in parts:
+            self.hasher.update(str(part).encode())
+            self.hasher.update(b'\0')
+
+    @preorder(Node)
+    def enter(self, node):
+        value = node.value if isinstance(node, Number) else ''
+        self._add(type(node).__name__, getattr(node, 'name', ''), value, _type_name(node))
+
+    @postorder(Node)
+    def leave(self, node):
+        self._add(')')
+
+    @preorder(Reference)
+    def enter(self, node):
+        self._add('Reference', node.name, _type_name(node))
+        if isinstance(node.target, Function):
+            self.callees[node.target] = None
+            self._add(*[_type_name(param) for param in node.target.parameters])
+
+
+def functions(root):
+    """Get the top-level functions of an analyzed module."""
+    for child in root:
+        if isinstance(child, Scope):
+            for node in child:
+                if isinstance(node, Function):
+                    yield node
+
+
+# What forked workers generate code for, set by the parent before forking
+_job = None
+
+def _generate(index):
+    """Generate, verify and optimize one function, returning its bitcode."""
+    root, todo, ssa, opt_level, debug = _job
+    function, callees = todo[index]
+    llvm_ir = codegen_function(root, function, callees, ssa, debug)
+    return optimize(parse_ir(llvm_ir), opt_level).as_bitcode()
+
+
+class IncrementalBuild:
+    """Generates code function by function, each in its own LLVM module,
+    optionally in parallel worker processes, and links the results.
+    Unless reuse is off, functions whose fingerprint has not changed
+    reuse their cached bitcode."""
+
+    def __init__(self, ssa=False, opt_level=0, jobs=1, reuse=True, debug=False):
+        self.ssa = ssa
+        self.opt_level = opt_level
+        self.jobs = jobs
+        self.reuse = reuse
+        self.debug = debug
+        # Names of the functions that had to be generated
+        self.compiled = []
+
+    def _generate_all(self, root, todo):
+        global _job
+        _job = (root, todo, self.ssa, self.opt_level, self.debug)
+        try:
+            if self.jobs > 1 and len(todo) > 1:
+                # Forked workers share the analyzed tree without pickling it;
+                # their own stages are not recorded
+                with stage('workers'), multiprocessing.get_context('fork').Pool(self.jobs) as pool:
+                    return pool.map(_generate, range(len(todo)))
+            return [_generate(i) for i in range(len(todo))]
+        finally:
+            _job = None
+
+    def _load(self, key):
+        """Load a function's cached module, or return None if there is none
+        that LLVM can read."""
+        data = cache.load('function', key)
+        if data is None:
+            return None
+        try:
+            return binding.parse_bitcode(data)
+        except RuntimeError:
+            return None
+
+    def build(self, root):
+        """Build a linked LLVM module for an analyzed tree. Each function is
+        optimized on its own first; optimizing the linked module (e.g.
+        to inline across functions) is up to the caller."""
+        modules = {}
+        todo = []
+        keys = []
+        target = target_key()
+        for function in functions(root):
+            fingerprint = Fingerprint()
+            fingerprint.visit(function)
+            key = cache.digest(cache.compiler_hash(), target, self.ssa, self.opt_level,
+                               fingerprint.hasher.hexdigest())
+            modules[function] = self._load(key) if self.reuse else None
+            if modules[function] is None:
+                todo.append((function, list(fingerprint.callees)))
+                keys.append(key)
+        for (function, _), key, data in zip(todo, keys, self._generate_all(root, todo)):
+            if self.reuse:
+                cache.store('function', key, data)
+            modules[function] = binding.parse_bitcode(data)
+            self.compiled.append(function.name)
+
+        with stage('link'):
+            mod = binding.parse_assembly("")
+            mod.triple = binding.get_default_triple()
+            for function_mod in modules.values():
+                mod.link_in(function_mod)
+        with stage('verify'):
+            mod.verify()
+        return mod
@@ -0,0 +1,174 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from . import visitor
+
+# The instrumentation recording stages, if any
+_active = None
+
+def active():
+    return _active is not None
+
+
+@contextmanager
+def stage(name, passes=()):
+    """Record what a stage of the compilation costs, if instrumentation is
+    on. Stages of the same name are added up. A stage walking several
+    passes at once gives them as (name, walker class) pairs, to have the
+    time and dispatches of each recorded as well."""
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name, passes):
+            yield
+
+
+class Stage:
+    __slots__ = ('name', 'calls', 'time', 'peak', 'nodes', 'dispatches', 'types', 'passes')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        # Most memory allocated above what was in use when the stage started
+        self.peak = 0
+        self.nodes = 0
+        self.dispatches = 0
+        # Nodes visited by node class
+        self.types = Counter()
+        # The passes sharing the stage's walk, by name. Their time is that
+        # of their hooks, leaving out the walk itself.
+        self.passes = {}
+
+
+class Instrumentation:
+    """Records wall time, memory peak, nodes visited and visitor method
+    dispatches of each stage run while it is active. Memory is traced with
+    tracemalloc, which slows everything else down, unless memory is False.
+    If profile_dir is given, each stage also writes a <name>.prof file for
+    pstats there. Passes sharing a walk are split up by timing each of
+    their hooks, unless passes is False."""
+
+    def __init__(self, profile_dir=None, memory=True, passes=True):
+        self.profile_dir = profile_dir
+        self.memory = memory
+        self.passes = passes
+        self.stages = {}
+        self._profiles = {}
+        self._depth = 0
+        # Highest memory in use seen by each stage running, outermost first
+        self._peaks = []
+
+    def __enter__(self):
+        global _active
+        _active = self
+        if self.memory:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = None
+        if self.memory:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name, passes=()):
+        record = self.stages.setdefault(name, Stage(name))
+        # Only the outermost stage is profiled and counted
+        outer = not self._depth
+        self._depth += 1
+        if outer:
+            counts = Counter()
+            visitor.count_dispatches(counts)
+            hook_times = Counter() if self.passes and len(passes) > 1 else None
+            visitor.time_hooks(hook_times)
+            profile = self._profiles.setdefault(name, cProfile.Profile()) if self.profile_dir else None
+            if profile:
+                profile.enable()
+        if self.memory:
+            base, peak = tracemalloc.get_traced_memory()
+            # Resetting the peak loses it for the stages around this one,
+            # so they keep what they saw up to here
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(base)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = 0
+            if self.memory:
+                highest = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], highest)
+                peak = highest - base
+            self._depth -= 1
+            if outer:
+                visitor.count_dispatches(None)
+                visitor.time_hooks(None)
+                if profile:
+                    profile.disable()
+                    os.makedirs(self.profile_dir, exist_ok=True)
+                    profile.dump_stats(os.path.join(self.profile_dir, name + '.prof'))
+                for (visitor_type, node_type), count in counts.items():
+                    record.nodes += count
+                    record.dispatches += count * visitor.hooks_per_node(visitor_type, node_type)
+                    record.types[node_type.__name__] += count
+                if hook_times is not None:
+                    self._record_passes(record, passes, counts, hook_times)
+            record.calls += 1
+            record.time += elapsed
+            record.peak = max(record.peak, peak)
+
+    def _record_passes(self, record, passes, counts, hook_times):
+        # Hooks belong to the pass whose walker declares or inherits them
+        owners = {}
+        for pass_name, walker in passes:
+            record.passes.setdefault(pass_name, Stage(pass_name)).calls += 1
+            for cls in walker.__mro__:
+                if cls not in (visitor.Walker, visitor.Visitor, object):
+                    owners.setdefault(visitor._qualname(cls), pass_name)
+        for owner, elapsed in hook_times.items():
+            if owner in owners:
+                record.passes[owners[owner]].time += elapsed
+        for (visitor_type, node_type), count in counts.items():
+            hooks = [owners.get(owner) for owner in visitor.hook_owners(visitor_type, node_type)]
+            for pass_name in set(hooks) - {None}:
+                record.passes[pass_name].nodes += count
+            for pass_name in hooks:
+                if pass_name:
+                    record.passes[pass_name].dispatches += count
+
+    def as_dict(self):
+        return [{'stage': s.name, 'calls': s.calls, 'time': s.time, 'peak_bytes': s.peak,
+                 'nodes': s.nodes, 'dispatches': s.dispatches, 'node_types': dict(s.types),
+                 'passes': [{'pass': p.name, 'time': p.time, 'nodes': p.nodes, 'dispatches': p.dispatches}
+                            for p in s.passes.values()]}
+                for s in self.stages.values()]
+
+    def report(self, file=None, format='table'):
+        """Print the stages to file, by default the current sys.stderr."""
+        if file is None:
+            file = sys.stderr
+        if format == 'json':
+            json.dump(self.as_dict(), file, indent=2)
+            print(file=file)
+            return
+        width = max([len('stage')] + [len(name) for name in self.stages])
+        print('%-*s %6s %11s %11s %9s %11s' % (width, 'stage', 'calls', 'time', 'peak', 'nodes', 'dispatches'),
+              file=file)
+        for s in self.stages.values():
+            print('%-*s %6d %8.3f ms %8.1f KB %9d %11d' % (
+                width, s.name, s.calls, s.time * 1000, s.peak / 1024, s.nodes, s.dispatches), file=file)
+            # Passes sharing the walk, with the time of their own hooks
+            for p in s.passes.values():
+                print('%-*s %6d %8.3f ms %11s %9d %11d' % (
+                    width, '  ' + p.name, p.calls, p.time * 1000, '', p.nodes, p.dispatches), file=file)
@@ -1,38 +1,152 @@
-from rply import LexerGenerator
+import re
+from rply import LexerGenerator, LexingError
+from rply.token import SourcePosition
+from .symbols import intern
+from . import cache
+
+
+# Built lexers, keyed on a hash of the token list
+_lexers = {}
+
+
+class Token():
+    """A compact token, interchangeable with rply's. The source position is
+    only worked out when asked for. Identifiers also carry their symbol."""
+    __slots__ = ('name', 'value', '_source', 'index', 'symbol')
+
+    def __init__(self, name, value, source, index, symbol=None):
+        self.name = name
+        self.value = value
+        self._source = source
+        self.index = index
+        self.symbol = symbol
+
+    def __repr__(self):
+        return "Token(%r, %r)" % (self.name, self.value)
+
+    def __eq__(self, other):
+        return self.name == other.gettokentype() and self.value == other.getstr()
+
+    def gettokentype(self):
+        return self.name
+
+    def getstr(self):
+        return self.value
+
+    def getsourcepos(self):
+        before = self._source[:self.index]
+        newline = '\n' if isinstance(before, str) else b'\n'
+        return SourcePosition(self.index, before.count(newline) + 1, self.index - before.rfind(newline))
+
+    source_pos = property(getsourcepos)
+
+
+class Scanner():
+    """Lexes in a single pass with one regex built from the token table.
+    Keywords are looked up after matching an identifier, so identifiers
+    merely starting with one (e.g. `iffy`) stay identifiers. Identifiers
+    are interned as they are lexed."""
+
+    def __init__(self, tokens, ignored):
+        self.keywords = {pattern: name for name, pattern in tokens if pattern.isalpha()}
+        rules = ['(?P<%s>%s)' % (name, pattern) for name, pattern in tokens if not pattern.isalpha()]
+        # The token is optional, so that trailing ignored text matches too
+        pattern = '(?:%s)*(?:%s)?' % ('|'.join(ignored), '|'.join(rules))
+        self.regex = re.compile(pattern)
+        self.binary_regex = re.compile(pattern.encode())
+
+    def lex(self, source, index=0):
+        """Lex from an index onwards. The source can also be bytes-like,
+        e.g. a memory-mapped file, as long as it is ASCII."""
+        text = isinstance(source, str)
+        match = (self.regex if text else self.binary_regex).match
+        keywords = self.keywords
+        end = len(source)
+        while index < end:
+            m = match(source, index)
+            name = m.lastgroup
+            if name is None:
+                if m.end() == end:
+                    return
+                start = m.end()
+                raise LexingError(None, Token(None, None, source, start).getsourcepos())
+            value = m.group(name)
+            index = m.end()
+            if not text:
+                value = value.decode()
+            if name == 'ID':
+                name = keywords.get(value, 'ID')
+                if name == 'ID':
+                    yield Token(name, value, source, index - len(value), intern(value))
+                    continue
+            yield Token(name, value, source, index - len(value))
+
+
+class _InterningLexer():
+    """Gives the identifiers lexed by an rply lexer their symbol, as the
+    Scanner does, so that its tokens can feed either parser."""
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+
+    def lex(self, source):
+        for token in self.lexer.lex(source):
+            if token.name == 'ID':
+                token.symbol = intern(token.value)
+            yield token
 
 
 class Lexer():
+    tokens = [
+        ('PRINT', r'print'),
+        ('LET', r'let'),
+        ('IF', r'if'),
+        ('FN', r'fn'),
+        ('ID', r'[A-Za-z][A-Za-z0-9]*'),
+        ('OPEN_PAREN', r'\('),
+        ('CLOSE_PAREN', r'\)'),
+        ('OPEN_BRACE', r'\{'),
+        ('CLOSE_BRACE', r'\}'),
+        ('SEMICOLON', r'\;'),
+        ('COMMA', r'\,'),
+        ('SUM', r'\+'),
+        ('SUB', r'\-'),
+        ('MUL', r'\*'),
+        ('DIV', r'\/'),
+        ('MOD', r'\%'),
+        ('NUMBER', r'\d+'),
+        ('EQ', r'=='),
+        ('NEQ', r'!='),
+        ('GEQ', r'>='),
+        ('LEQ', r'<='),
+        ('ASSIGN', r'='),
+        ('GT', r'>'),
+        ('LT', r'<'),
+    ]
+    # Ignore spaces
+    ignored = [r'\s+']
+
     def __init__(self):
         self.lexer = LexerGenerator()
 
     def _add_tokens(self):
-        self.lexer.add('PRINT', r'print')
-        self.lexer.add('LET', r'let')
-        self.lexer.add('IF', r'if')
-        self.lexer.add('FN', r'fn')
-        self.lexer.add('ID', r'[A-Za-z][A-Za-z0-9]*')
-        self.lexer.add('OPEN_PAREN', r'\(')
-        self.lexer.add('CLOSE_PAREN', r'\)')
-        self.lexer.add('OPEN_BRACE', r'\{')
-        self.lexer.add('CLOSE_BRACE', r'\}')
-        self.lexer.add('SEMICOLON', r'\;')
-        self.lexer.add('COMMA', r'\,')
-        self.lexer.add('SUM', r'\+')
-        self.lexer.add('SUB', r'\-')
-        self.lexer.add('MUL', r'\*')
-        self.lexer.add('DIV', r'\/')
-        self.lexer.add('MOD', r'\%')
-        self.lexer.add('NUMBER', r'\d+')
-        self.lexer.add('EQ', r'==')
-        self.lexer.add('NEQ', r'!=')
-        self.lexer.add('GEQ', r'>=')
-        self.lexer.add('LEQ', r'<=')
-        self.lexer.add('ASSIGN', r'=')
-        self.lexer.add('GT', r'>')
-        self.lexer.add('LT', r'<')
-        # Ignore spaces
-        self.lexer.ignore('\s+')
+        for name, pattern in self.tokens:
+            self.lexer.add(name, pattern)
+        for pattern in self.ignored:
+            self.lexer.ignore(pattern)
 
     def get_lexer(self):
-        self._add_tokens()
-        return self.lexer.build()
+        # Compiled regexes cannot be stored on disk, but they can be shared
+        key = cache.digest(self.tokens, self.ignored)
+        if key not in _lexers:
+            _lexers[key] = Scanner(self.tokens, self.ignored)
+        return _lexers[key]
+
+    def get_rply_lexer(self):
+        """Get the equivalent rply lexer, which tries each token's regex in
+        turn and, unlike get_lexer's, lexes keyword prefixes as keywords."""
+        key = cache.digest('rply', self.tokens, self.ignored)
+        if key not in _lexers:
+            self._add_tokens()
+            _lexers[key] = _InterningLexer(self.lexer.build())
+        return _lexers[key]
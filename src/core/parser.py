@@ -1,5 +1,10 @@
+import marshal
 from rply import ParserGenerator
+from rply.grammar import Grammar
+from rply.parser import LRParser
+from rply.parsergenerator import LRTable
 from .ast import *
+from . import cache
 
 
 class Parser():
@@ -28,16 +33,16 @@ class Parser():
 
         @self.pg.production('function : ID OPEN_PAREN CLOSE_PAREN block')
         def function(p):
-            return Function(p[0].getstr(), p[3])
+            return Function(p[0].symbol, p[3])
 
         @self.pg.production('function : ID OPEN_PAREN parameters CLOSE_PAREN block')
         def function(p):
             #return Function(p[1].getstr(), p[5], ParameterList(p[3]))
-            return Function(p[0].getstr(), p[4], p[2])
+            return Function(p[0].symbol, p[4], p[2])
 
         @self.pg.production('expression : simple_expression OPEN_PAREN CLOSE_PAREN')
         def function_call(p):
-            return Call(p[0])
+            return Call(p[0], ArgumentList([]))
 
         @self.pg.production('expression : simple_expression OPEN_PAREN expressions CLOSE_PAREN')
         def function_call(p):
@@ -61,7 +66,7 @@ class Parser():
 
         @self.pg.production('statement : LET ID ASSIGN expression SEMICOLON')
         def var_declaration(p):
-            return VarDecl(p[1].getstr(), p[3])
+            return VarDecl(p[1].symbol, p[3])
 
         @self.pg.production('statements : ')
         def empty_statements(p):
@@ -83,14 +88,14 @@ class Parser():
 
         @self.pg.production('parameters : ID ID')
         def parameters_single(p):
-            typeref = Reference(p[1].getstr())
-            param = Variable(p[0].getstr(), typeref)
+            typeref = Reference(p[1].symbol)
+            param = Variable(p[0].symbol, typeref)
             return VariableList([param])
 
         @self.pg.production('parameters : parameters COMMA ID ID')
         def parameters(p):
-            typeref = Reference(p[3].getstr())
-            param = Variable(p[2].getstr(), typeref)
+            typeref = Reference(p[3].symbol)
+            param = Variable(p[2].symbol, typeref)
             p[0].add_child(param)
             return p[0]
 
@@ -104,7 +109,7 @@ class Parser():
 
         @self.pg.production('simple_expression : ID')
         def reference(p):
-            return Reference(p[0].getstr())
+            return Reference(p[0].symbol)
 
         @self.pg.production('expression : expression SUM expression')
         @self.pg.production('expression : expression SUB expression')
@@ -152,5 +157,31 @@ class Parser():
         def error_handle(token):
             raise ValueError(token)
 
+    def _grammar_hash(self):
+        productions = [(name, syms, precedence) for name, syms, _, precedence in self.pg.productions]
+        return cache.digest(ParserGenerator.VERSION, self.pg.tokens, self.pg.precedence, productions)
+
+    def _grammar(self):
+        # Same as ParserGenerator.build, minus the LALR analysis
+        g = Grammar(self.pg.tokens)
+        for level, (assoc, terms) in enumerate(self.pg.precedence, 1):
+            for term in terms:
+                g.set_precedence(term, assoc, level)
+        for name, syms, func, precedence in self.pg.productions:
+            g.add_production(name, syms, func, precedence)
+        g.set_start()
+        return g
+
     def get_parser(self):
-        return self.pg.build()
+        key = self._grammar_hash()
+        data = cache.load('parser', key)
+        if data:
+            try:
+                table = LRTable.from_cache(self._grammar(), marshal.loads(data))
+                return LRParser(table, self.pg.error_handler)
+            except (ValueError, EOFError, TypeError, KeyError, IndexError):
+                pass
+        parser = self.pg.build()
+        # The table is only strings, numbers and containers of them
+        cache.store('parser', key, marshal.dumps(self.pg.serialize_table(parser.lr_table)))
+        return parser
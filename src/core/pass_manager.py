@@ -0,0 +1,134 @@
+from itertools import combinations
+from .visitor import *
+from .scoper import Scoper
+from .prim_typer import PrimitiveTyper
+from .resolver import Resolver
+from .caster import Caster
+from .type_propagator import TypePropagator
+from .folder import ConstantFolder
+from .printer import Printer
+from .instrument import stage
+
+
+class Pass:
+    """A tree walk over the whole module.
+
+    Fusable passes only look at each node in tree order (or at its already
+    visited children), so they can share a walk with the passes they
+    require. Passes that restructure the tree or need complete results
+    get a walk of their own. Passes that update their results instead
+    of walking again when they are run a second time have a visitor with
+    an update() method, which is called on the visitor of the first run."""
+
+    def __init__(self, name, visitor, requires=(), fusable=True, debug=False, updates=False):
+        self.name = name
+        self.visitor = visitor
+        self.requires = requires
+        self.fusable = fusable
+        self.debug = debug
+        self.updates = updates
+
+
+passes = {p.name: p for p in [
+    Pass('scope', Scoper, fusable=False),
+    Pass('primitive_type', PrimitiveTyper, requires=('scope',)),
+    Pass('resolve', Resolver, requires=('primitive_type',), updates=True),
+    Pass('cast', Caster, requires=('resolve',)),
+    Pass('propagate_types', TypePropagator, requires=('cast',)),
+    Pass('fold', ConstantFolder, requires=('propagate_types',)),
+    Pass('print_tree', Printer, fusable=False, debug=True),
+]}
+
+# The front end as main.py runs it
+default_pipeline = ['scope', 'primitive_type', 'print_tree', 'resolve', 'cast',
+                    'propagate_types', 'resolve', 'fold', 'print_tree']
+
+
+# Fused visitor classes, keyed on their components
+_fused = {}
+
+def fuse(classes):
+    """Create a visitor that does the work of all classes in one walk."""
+    classes = tuple(classes)
+    if len(classes) == 1:
+        return classes[0]
+    if classes not in _fused:
+        def __init__(self):
+            for cls in classes:
+                cls.__init__(self)
+        name = '+'.join(cls.__name__ for cls in classes)
+        _fused[classes] = type(name, classes, {'__init__': __init__})
+    return _fused[classes]
+
+
+def fusable(classes):
+    """Check that visitors handle unrelated node types and keep separate state."""
+    for a, b in combinations(classes, 2):
+        for x in handled_types(a):
+            for y in handled_types(b):
+                if issubclass(x, y) or issubclass(y, x):
+                    return False
+        if vars(a()).keys() & vars(b()).keys():
+            return False
+    return True
+
+
+class PassManager:
+    def __init__(self, pipeline=default_pipeline, debug=False, visitors={}):
+        self.debug = debug
+        # Replacement visitor classes, e.g. {'scope': FlatScoper}
+        self.visitors = visitors
+        self.pipeline = self._expand(pipeline)
+
+    def _expand(self, pipeline):
+        """Insert passes that are required but not scheduled before."""
+        done = set()
+        expanded = []
+        def add(name):
+            for required in passes[name].requires:
+                if required not in done:
+                    add(required)
+            done.add(name)
+            expanded.append(passes[name])
+        for name in pipeline:
+            if passes[name].debug and not self.debug:
+                continue
+            add(name)
+        return expanded
+
+    def _visitor(self, p):
+        return self.visitors.get(p.name, p.visitor)
+
+    def schedule(self):
+        """Split the pipeline into walks, fusing consecutive passes where
+        possible. Updates of passes that ran before are steps of their own."""
+        walks = []
+        scheduled = set()
+        update = False
+        for p in self.pipeline:
+            walk = walks[-1] if walks else None
+            if p.updates and p in scheduled:
+                walks.append([p])
+                update = True
+            elif (walk and not update and p.fusable and walk[-1].fusable and p not in walk
+                    and fusable([self._visitor(q) for q in walk + [p]])):
+                walk.append(p)
+            else:
+                walks.append([p])
+                update = False
+            scheduled.add(p)
+        return walks
+
+    def run(self, root):
+        # Visitors of the passes that can be updated
+        visitors = {}
+        for walk in self.schedule():
+            if walk[0] in visitors:
+                with stage(walk[0].name + ' update'):
+                    visitors[walk[0]].update()
+                continue
+            visitor = fuse(self._visitor(p) for p in walk)()
+            with stage('+'.join(p.name for p in walk), [(p.name, self._visitor(p)) for p in walk]):
+                visitor.visit(root)
+            visitors.update((p, visitor) for p in walk if p.updates)
+        return root
@@ -0,0 +1,160 @@
+from rply.token import Token
+from .ast import *
+
+
+# Binding power and node of each binary operator, following the
+# precedence table of the rply grammar
+_operators = {
+    'SUM': (1, Sum), 'SUB': (1, Sub),
+    'MUL': (2, Mul), 'DIV': (2, Div), 'MOD': (2, Mod),
+    'EQ': (3, Eq), 'NEQ': (3, Neq), 'GT': (3, Gt), 'LT': (3, Lt), 'GEQ': (3, Geq), 'LEQ': (3, Leq),
+}
+
+_end = Token('$end', '$end')
+
+
+class PrattParser():
+    """Hand-written parser for the grammar in parser.py, building the same
+    trees without any table construction. Like the rply parser, it raises
+    ValueError with the first unexpected token."""
+
+    def parse(self, tokens):
+        return _Parse(tokens).program()
+
+    def parse_function(self, tokens):
+        """Parse a single function, reading at most one token past its end."""
+        return _Parse(tokens).function()
+
+    def declarations(self, tokens):
+        """Skim through the functions without building their bodies,
+        yielding the symbol of the name, the (name, type name) symbol pairs
+        of the parameters and the index of the first token of each."""
+        return _Parse(tokens).declarations()
+
+
+class _Parse():
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.token = None
+        self.advance()
+
+    def advance(self):
+        """Move to the next token, returning the current one."""
+        token = self.token
+        self.token = next(self.tokens, _end)
+        self.type = self.token.gettokentype()
+        return token
+
+    def expect(self, type):
+        if self.type != type:
+            raise ValueError(self.token)
+        return self.advance()
+
+    def program(self):
+        module = Module()
+        while self.type != '$end':
+            module.add_child(self.function())
+        return module
+
+    def declarations(self):
+        while self.type != '$end':
+            index = self.token.index
+            name, parameters = self.header()
+            self.skip_block()
+            yield name, parameters, index
+
+    def function(self):
+        name, parameters = self.header()
+        parameters = [Variable(parameter, Reference(type)) for parameter, type in parameters]
+        return Function(name, self.block(), VariableList(parameters))
+
+    def header(self):
+        name = self.expect('ID').symbol
+        self.expect('OPEN_PAREN')
+        parameters = []
+        if self.type != 'CLOSE_PAREN':
+            parameters.append(self.parameter())
+            while self.type == 'COMMA':
+                self.advance()
+                parameters.append(self.parameter())
+        self.expect('CLOSE_PAREN')
+        return name, parameters
+
+    def parameter(self):
+        return self.expect('ID').symbol, self.expect('ID').symbol
+
+    def skip_block(self):
+        self.expect('OPEN_BRACE')
+        depth = 1
+        while depth:
+            if self.type == 'OPEN_BRACE':
+                depth += 1
+            elif self.type == 'CLOSE_BRACE':
+                depth -= 1
+            elif self.type == '$end':
+                raise ValueError(self.token)
+            self.advance()
+
+    def block(self):
+        self.expect('OPEN_BRACE')
+        statements = []
+        while self.type != 'CLOSE_BRACE':
+            statements.append(self.statement())
+        self.advance()
+        return Block(statements)
+
+    def statement(self):
+        if self.type == 'IF':
+            self.advance()
+            predicate = self.expression()
+            return If(predicate, self.block())
+        if self.type == 'LET':
+            self.advance()
+            name = self.expect('ID').symbol
+            self.expect('ASSIGN')
+            statement = VarDecl(name, self.expression())
+        elif self.type == 'PRINT':
+            self.advance()
+            self.expect('OPEN_PAREN')
+            statement = Print(self.expression())
+            self.expect('CLOSE_PAREN')
+        else:
+            statement = self.expression()
+        self.expect('SEMICOLON')
+        return statement
+
+    def expression(self, power=0):
+        """Parse operators binding tighter than the given power. All of
+        them are left associative."""
+        left = self.operand()
+        while self.type in _operators:
+            operator_power, operator = _operators[self.type]
+            if operator_power <= power:
+                break
+            self.advance()
+            left = operator(left, self.expression(operator_power))
+        return left
+
+    def operand(self):
+        operand = self.simple_expression()
+        if self.type != 'OPEN_PAREN':
+            return operand
+        self.advance()
+        arguments = []
+        if self.type != 'CLOSE_PAREN':
+            arguments.append(self.expression())
+            while self.type == 'COMMA':
+                self.advance()
+                arguments.append(self.expression())
+        self.expect('CLOSE_PAREN')
+        return Call(operand, ArgumentList(arguments))
+
+    def simple_expression(self):
+        if self.type == 'NUMBER':
+            return Number(self.advance().value)
+        if self.type == 'ID':
+            return Reference(self.advance().symbol)
+        self.expect('OPEN_PAREN')
+        expression = self.expression()
+        self.expect('CLOSE_PAREN')
+        return expression
@@ -1,33 +1,34 @@
 from .visitor import *
 from .ast import *
+from .type_table import types
 
 
-class PrimitiveTyper(Visitor):
+class PrimitiveTyper(Walker):
     def __init__(self):
-        self.int8 = Type("int8")
-        self.int32 = Type("int32")
-        self.func = Type("fn()")
-        self.builtin = [self.int8, self.int32, self.func]
+        self.builtin = [types.get('int8'), types.get('int32')]
 
-    @visitor(Number)
-    def visit(self, node):
-        node.type = Reference(self.int32)
+    @preorder(Number)
+    def enter(self, node):
+        node.type = types.get('int32')
 
-    @visitor(Function)
-    def visit(self, node):
-        node.type = Reference(self.func)
-        self.iterate(node)
+    @preorder(Function)
+    def enter(self, node):
+        # Parameter types are known before the body, so calls to functions
+        # defined further down can be typed too
+        for param in node.parameters:
+            type = node.block.resolve(param.annotation.symbol)
+            if not isinstance(type, Type):
+                raise TypeError("%s is not a type" % param.annotation.name)
+            param.type = type
+        node.type = types.function([param.type for param in node.parameters])
 
-    @visitor(Module)
-    def visit(self, node):
+    @preorder(Module)
+    def enter(self, node):
         for child in node:
             if isinstance(child, Scope):
                 for type in self.builtin:
-                    child.register(type.name, type)
-                    node.add_child(type)
-                node.add_child(child.unlink())
+                    child.register(type.symbol, type)
                 break
-        self.iterate(node)
 
 
 def primitive_type(root):
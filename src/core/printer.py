@@ -1,13 +1,13 @@
 from .visitor import *
 from .ast import *
 
-class Printer(Visitor):
+class Printer(Walker):
     def __init__(self):
         self.indent = ''
         self.indent_step = '    '
 
-    @visitor(Node)
-    def visit(self, node):
+    @preorder(Node)
+    def enter(self, node):
         repr = self.indent + type(node).__name__
         if hasattr(node, 'name'):
             repr += " '" + node.name + "'"
@@ -18,7 +18,9 @@ class Printer(Visitor):
                 repr += " [" + (str(node.type.name) if node.type else '?') + "]"
         print(repr)
         self.indent += self.indent_step
-        self.iterate(node)
+
+    @postorder(Node)
+    def leave(self, node):
         self.indent = self.indent[:-len(self.indent_step)]
 
 
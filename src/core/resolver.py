@@ -2,22 +2,53 @@ from .visitor import *
 from .ast import *
 
 
-class Resolver(Visitor):
+class Resolver(Walker):
+    """Binds references to what they refer to and gives them its type.
+    References stay bound, so walking again only binds new ones. Those
+    whose target has no type yet are kept in a list for update()."""
+
     def __init__(self):
         self.scope = None
+        self.unresolved = []
+
+    def _type(self, node):
+        """Give a reference its target's type. Returns False if the target
+        has none yet."""
+        target = node.target
+        if isinstance(target, Type):
+            return True
+        node.type = target.type
+        return node.type is not None
+
+    @preorder(Reference)
+    def enter(self, node):
+        if node.target is None:
+            node.target = self.scope.resolve(node.symbol)
+        if not self._type(node):
+            self.unresolved.append(node)
 
-    @visitor(Reference)
-    def visit(self, node):
-        node.target = self.scope.resolve(node.name)
-        if not isinstance(node.target, Type) and node.target.type:
-            node.type = Reference(node.target.type.target)
+    @preorder(Variable)
+    def enter(self, node):
+        if node._parent is self.scope:
+            self.scope.declare(node.symbol, node)
 
-    @visitor(Scope)
-    def visit(self, node):
+    @preorder(Scope)
+    def enter(self, node):
+        node.declared = {}
         self.scope = node
-        self.iterate(node)
+
+    @postorder(Scope)
+    def leave(self, node):
+        # Cached lookups are only valid while the scope is walked
+        node.lookups.clear()
         self.scope = node.parent_scope
 
+    def update(self):
+        """Type the references left untyped by the walk, without walking
+        again. Passes after this one only add references that are bound
+        already, so nothing else can need resolving."""
+        self.unresolved = [node for node in self.unresolved if not self._type(node)]
+
 
 def resolve(root):
     Resolver().visit(root)
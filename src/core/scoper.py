@@ -1,41 +1,64 @@
 from .visitor import *
 from .ast import *
 
-class Scoper(Visitor):
+class Scoper(Walker):
     def __init__(self):
         self.scope = None
 
-    @visitor(VarDecl)
-    def visit(self, node):
-        scope = Scope([Assignment(Reference(node.name), node.expression)])
-        scope.add_children(*node._parent[node.selfref+1:])
-        variable = Variable(node.name)
-        scope.register(node.name, variable)
+    @preorder(VarDecl)
+    def enter(self, node):
+        scope = Scope([Assignment(Reference(node.symbol), node.expression)])
+        # The statements after the let, found without positions
+        following = []
+        sibling = node.next()
+        while sibling:
+            following.append(sibling)
+            sibling = sibling.next()
+        scope.add_children(*following)
+        variable = Variable(node.symbol)
+        scope.register(node.symbol, variable)
+        # The walk continues with the new scope
         node.replace(variable, scope)
-        self.visit(scope) # TODO: do this automatically
+        return SKIP
 
-    @visitor(Function)
-    def visit(self, node):
-        self.scope.register(node.name, node)
+    @preorder(Function)
+    def enter(self, node):
+        self.scope.register(node.symbol, node)
         scope = Scope(node.block)
         node.block = scope
         for param in node.parameters:
-            scope.register(param.name, param)
-        self.iterate(node)
+            scope.register(param.symbol, param)
 
-    @visitor(Scope)
-    def visit(self, node):
+    @preorder(Scope)
+    def enter(self, node):
         node.parent_scope = self.scope
         self.scope = node
-        self.iterate(node)
+
+    @postorder(Scope)
+    def leave(self, node):
         self.scope = node.parent_scope
 
-    @visitor(Module)
-    def visit(self, node):
+    @preorder(Module)
+    def enter(self, node):
         scope = Scope(node)
         node.add_child(scope)
-        self.iterate(node)
 
 
-def scope(root):
-    Scoper().visit(root)
+class FlatScoper(Scoper):
+    """Keeps a single scope per block. Variables are declared where their
+    `let` was, so they only become visible to the statements after it."""
+
+    @preorder(VarDecl)
+    def enter(self, node):
+        node.replace(Variable(node.symbol), Assignment(Reference(node.symbol), node.expression))
+        return SKIP
+
+    @preorder(Block)
+    def enter(self, node):
+        scope = Scope(node)
+        node.replace(scope)
+        return scope
+
+
+def scope(root, flat=False):
+    (FlatScoper() if flat else Scoper()).visit(root)
@@ -0,0 +1,154 @@
+import marshal
+from . import ast
+from .ast import Node, DictNode, ListNode, Type, FunctionType
+from .symbols import symbols, intern
+from .type_table import types
+
+# Bump whenever the format changes
+VERSION = 3
+
+# Slots that follow from the tree structure or only hold generated code
+_skipped = {'_parent', '_ref', '_prev', '_next', '_head', '_tail', '_array', '_stale',
+            'ir', 'printf', 'fmtstr', 'module'}
+
+# Slots holding a symbol, and slots holding dicts keyed on symbols, which
+# are stored as names because symbols differ between processes
+_symbol_slots = {'symbol'}
+_symbol_keyed = {'names', 'declared', 'lookups'}
+
+# Names of the slots stored for each node class
+_attributes = {}
+
+def _attributes_of(cls):
+    if cls not in _attributes:
+        slots = [slot for base in reversed(cls.__mro__) for slot in base.__dict__.get('__slots__', ())]
+        fields = getattr(cls, '_fields', ())
+        _attributes[cls] = tuple(slot for slot in slots if slot not in _skipped and slot not in fields)
+    return _attributes[cls]
+
+
+def dump(root):
+    """Serialize an analyzed tree to bytes. Nodes are stored in pre-order
+    as their kind, the index of their parent and their slot in it, and
+    their other attributes, with links to other nodes (reference targets,
+    scope entries) stored as indices. Nodes that are linked to but not
+    part of the tree are stored as roots of their own. Symbols are stored
+    as names, and so are types, which are looked up in the type table
+    when loading."""
+    index = {}
+    nodes = []
+    kinds = {}
+    records = []
+
+    def walk(root):
+        stack = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index[node] = len(nodes)
+            nodes.append((node, parent))
+            stack.extend(reversed([(child, index[node]) for child in node]))
+
+    def encode(value):
+        if isinstance(value, (Type, FunctionType)):
+            return (None, value.name)
+        if isinstance(value, Node):
+            if value not in index:
+                walk(value)
+            return (index[value],)
+        if isinstance(value, dict):
+            return {key: encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        raise TypeError("cannot serialize %r" % value)
+
+    def encode_attribute(node, name):
+        value = getattr(node, name, None)
+        if value is None:
+            return None
+        if name in _symbol_slots:
+            return symbols.names[value]
+        if name in _symbol_keyed:
+            return {symbols.names[symbol]: encode(item) for symbol, item in value.items()}
+        return encode(value)
+
+    walk(root)
+    # Encoding attributes can add nodes to walk
+    i = 0
+    while i < len(nodes):
+        node, parent = nodes[i]
+        cls = type(node)
+        kind = kinds.setdefault(cls, len(kinds))
+        ref = node._ref if parent >= 0 and isinstance(nodes[parent][0], DictNode) else None
+        attributes = tuple(encode_attribute(node, name) for name in _attributes_of(cls))
+        records.append((kind, parent, ref, attributes))
+        i += 1
+    return marshal.dumps((VERSION, [cls.__name__ for cls in kinds], records))
+
+
+def load(data):
+    """Rebuild a tree serialized with dump."""
+    version, kinds, records = marshal.loads(data)
+    if version != VERSION:
+        raise ValueError("unsupported version %r" % version)
+    # Going around DictNode.__setattr__ saves most of the time here
+    set = object.__setattr__
+    classes = [getattr(ast, name) for name in kinds]
+    lists = [issubclass(cls, ListNode) for cls in classes]
+    fields = [() if issubclass(cls, ListNode) else cls._fields for cls in classes]
+
+    nodes = []
+    for kind, parent, ref, _ in records:
+        cls = classes[kind]
+        node = cls.__new__(cls)
+        set(node, '_prev', None)
+        set(node, '_next', None)
+        for name in fields[kind]:
+            set(node, name, None)
+        if lists[kind]:
+            node._head = node._tail = None
+            node._array = []
+            node._stale = False
+        if parent < 0:
+            set(node, '_parent', None)
+            set(node, '_ref', None)
+        else:
+            parent = nodes[parent]
+            set(node, '_parent', parent)
+            if ref is None:
+                tail = parent._tail
+                if tail:
+                    set(tail, '_next', node)
+                    set(node, '_prev', tail)
+                else:
+                    parent._head = node
+                parent._tail = node
+                set(node, '_ref', len(parent._array))
+                parent._array.append(node)
+            else:
+                set(parent, ref, node)
+                set(node, '_ref', ref)
+        nodes.append(node)
+
+    def decode(value):
+        if isinstance(value, tuple):
+            return nodes[value[0]] if len(value) == 1 else types.get(value[1])
+        if isinstance(value, dict):
+            return {key: decode(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        return value
+
+    def decode_attribute(name, value):
+        if name in _symbol_slots:
+            return intern(value)
+        if name in _symbol_keyed:
+            return {intern(key): decode(item) for key, item in value.items()}
+        return value if type(value) is str else decode(value)
+
+    attributes = [_attributes_of(cls) for cls in classes]
+    for node, (kind, _, _, values) in zip(nodes, records):
+        for name, value in zip(attributes[kind], values):
+            set(node, name, value if value is None else decode_attribute(name, value))
+    return nodes[0]
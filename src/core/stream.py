@@ -0,0 +1,73 @@
+import mmap
+from llvmlite import binding
+from .visitor import *
+from .ast import *
+from .lexer import Lexer
+from .pratt import PrattParser
+from .scoper import FlatScoper
+from .pass_manager import PassManager
+from .codegen import codegen_function, parse_ir, optimize
+from .instrument import stage
+
+
+class _Names(Walker):
+    """Collects the symbols of the names a tree refers to."""
+
+    def __init__(self):
+        self.symbols = set()
+
+    @preorder(Reference)
+    def enter(self, node):
+        self.symbols.add(node.symbol)
+
+
+class StreamingBuild:
+    """Compiles a memory-mapped source file one function at a time, so that
+    only one function's tree is alive at any point.
+
+    A first pass skims the file for the function signatures. Then each
+    function is lexed and parsed on its own, analyzed along with bodiless
+    copies of the functions it calls, and compiled into a module of its
+    own, which is linked into the result."""
+
+    def __init__(self, ssa=False, opt_level=0, flat_scopes=False, debug=False):
+        self.ssa = ssa
+        self.opt_level = opt_level
+        self.flat_scopes = flat_scopes
+        self.debug = debug
+        self.lexer = Lexer().get_lexer()
+        self.parser = PrattParser()
+
+    def build(self, path):
+        mod = binding.parse_assembly("")
+        mod.triple = binding.get_default_triple()
+        with open(path, 'rb') as f:
+            # Empty files cannot be mapped
+            if not f.seek(0, 2):
+                return mod
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                with stage('declarations'):
+                    declarations = list(self.parser.declarations(self.lexer.lex(source)))
+                signatures = {name: parameters for name, parameters, _ in declarations}
+                for _, _, index in declarations:
+                    function = self._compile(source, index, signatures)
+                    with stage('link'):
+                        mod.link_in(function)
+        with stage('verify'):
+            mod.verify()
+        return mod
+
+    def _compile(self, source, index, signatures):
+        with stage('parse'):
+            function = self.parser.parse_function(self.lexer.lex(source, index))
+        names = _Names()
+        names.visit(function)
+        callees = [Function(symbol, Block([]), VariableList([Variable(parameter, Reference(type))
+                                                              for parameter, type in signatures[symbol]]))
+                   for symbol in sorted(names.symbols) if symbol in signatures and symbol != function.symbol]
+        root = Module()
+        root.add_children(*callees, function)
+        visitors = {'scope': FlatScoper} if self.flat_scopes else {}
+        PassManager(debug=self.debug, visitors=visitors).run(root)
+        llvm_ir = codegen_function(root, function, callees, self.ssa, self.debug)
+        return optimize(parse_ir(llvm_ir), self.opt_level)
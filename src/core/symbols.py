@@ -0,0 +1,28 @@
+class SymbolTable:
+    """Numbers identifiers in the order they are first seen. Nodes keep the
+    number, their symbol, instead of the name, so that names are compared
+    and hashed as small integers."""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        """Get the symbol of a name, adding it if it is new."""
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def name(self, symbol):
+        return self.names[symbol]
+
+    def __len__(self):
+        return len(self.names)
+
+
+# Shared by everything in the process, including forked workers. Symbols
+# mean nothing to another process, so only names are stored on disk.
+symbols = SymbolTable()
+intern = symbols.intern
@@ -2,20 +2,17 @@ from .visitor import *
 from .ast import *
 
 
-class TypePropagator(Visitor):
-    @visitor(Assignment)
-    def visit(self, node):
-        self.iterate(node)
+class TypePropagator(Walker):
+    @postorder(Assignment)
+    def leave(self, node):
         if not node.lhs.type:
-            node.lhs.target.type = Reference(node.rhs.type.target)
-            node.lhs.type = Reference(node.rhs.type.target)
-        assert node.lhs.type.target == node.rhs.type.target
+            node.lhs.target.type = node.lhs.type = node.rhs.type
+        assert node.lhs.type is node.rhs.type
         node.type = node.lhs.type
 
-    @visitor(BinaryOp)
-    def visit(self, node):
-        self.iterate(node)
-        assert node.left.type.target and node.left.type.target == node.right.type.target
+    @postorder(BinaryOp)
+    def leave(self, node):
+        assert node.left.type and node.left.type is node.right.type
         node.type = node.left.type
 
 
@@ -0,0 +1,43 @@
+from llvmlite import ir
+from .ast import Type, FunctionType
+
+
+class TypeTable:
+    """Holds the one object of each type. Types carry their LLVM type, made
+    when they are first asked for."""
+
+    def __init__(self):
+        # Types by name
+        self.types = {}
+        for bits in (8, 16, 32, 64):
+            self._add(Type('int%d' % bits), ir.IntType(bits))
+        # What comparisons give. Not a name programs can use.
+        self._add(Type('bool'), ir.IntType(1))
+
+    def _add(self, type, llvm_type):
+        type.ir = llvm_type
+        self.types[type.name] = type
+        return type
+
+    def get(self, name):
+        """Get a type by its name, e.g. 'int32' or 'fn(int32, int8)'."""
+        type = self.types.get(name)
+        if type:
+            return type
+        if name.startswith('fn(') and name.endswith(')'):
+            parameters = name[3:-1]
+            return self.function([self.get(p) for p in parameters.split(', ')] if parameters else [])
+        raise KeyError(name)
+
+    def function(self, parameters):
+        """Get the type of functions taking parameters of the given types."""
+        name = 'fn(%s)' % ', '.join(type.name for type in parameters)
+        type = self.types.get(name)
+        if not type:
+            llvm_type = ir.FunctionType(ir.VoidType(), [type.ir for type in parameters])
+            type = self._add(FunctionType(name, tuple(parameters), None), llvm_type)
+        return type
+
+
+# Shared by every module compiled in the process
+types = TypeTable()
@@ -1,3 +1,5 @@
+from time import perf_counter
+
 def _qualname(obj):
     """Get the fully-qualified name of an object (including module)."""
     return obj.__module__ + '.' + obj.__qualname__
@@ -10,25 +12,70 @@ def _declaring_class(obj):
 # Stores the actual visitor methods
 _methods = {}
 
-def _get_method(class_type, arg_type):
-    try:
-        return _methods[(_qualname(class_type), arg_type)]
-    except KeyError as e:
-        if len(arg_type.__bases__) == 0:
-            raise e
-        try:
-            return _get_method(class_type, arg_type.__bases__[0])
-        except KeyError as e:
-            if len(class_type.__bases__) == 0:
-                raise e
-            return _get_method(class_type.__bases__[0], arg_type)
+# Resolved methods, keyed on (visitor class, argument class)
+_dispatch = {}
+
+def _resolve(class_type, arg_type, methods=_methods):
+    """Find the visitor method for the most derived visitor class that has
+    one, preferring the most specific argument type within each class."""
+    for cls in class_type.__mro__:
+        name = _qualname(cls)
+        for arg in arg_type.__mro__:
+            method = methods.get((name, arg))
+            if method:
+                return method
+    raise KeyError((class_type, arg_type))
+
+# Nodes visited, keyed on (visitor class, node class), while counting
+_counts = None
+
+def count_dispatches(counts):
+    """Start counting visited nodes into a Counter, or stop if it is None."""
+    global _counts
+    _counts = counts
+
+def hooks_per_node(class_type, arg_type):
+    """Number of methods a visitor runs for each node of a type."""
+    if issubclass(class_type, Walker):
+        return len(hook_owners(class_type, arg_type))
+    return 1
+
+def hook_owners(class_type, arg_type):
+    """Names of the classes declaring the hooks a walker runs for each node
+    of a type."""
+    return [_declaring_class(hook) for hook in _resolve_hooks(class_type, arg_type) if hook]
+
+# Time spent in walker hooks, keyed on the name of the class declaring
+# them, while timing
+_hook_times = None
+# Time spent in the hooks run by the hook running now
+_inner = 0.0
+
+def time_hooks(times):
+    """Start adding up the time of walker hooks into a Counter, or stop if
+    it is None. Only walks started while timing are timed."""
+    global _hook_times
+    _hook_times = times
 
 # Delegating visitor implementation
 def _visitor_impl(self, arg):
     """Actual visitor method implementation."""
-    method = _get_method(type(self), type(arg))
+    key = (type(self), type(arg))
+    if _counts is not None:
+        _counts[key] += 1
+    try:
+        method = _dispatch[key]
+    except KeyError:
+        method = _dispatch[key] = _resolve(*key)
     return method(self, arg)
 
+def handled_types(class_type):
+    """Get the argument types that a visitor class or its bases (other than
+    the generic Visitor) have methods for."""
+    names = {_qualname(cls) for cls in class_type.__mro__ if cls not in (Visitor, Walker, object)}
+    return [arg for methods in (_methods, _enter_methods, _leave_methods)
+            for cls, arg in methods if cls in names]
+
 # The actual @visitor decorator
 def visitor(arg_type):
     """Decorator that creates a visitor method."""
@@ -36,6 +83,7 @@ def visitor(arg_type):
     def decorator(fn):
         declaring_class = _declaring_class(fn)
         _methods[(declaring_class, arg_type)] = fn
+        _dispatch.clear()
 
         # Replace all decorated methods with _visitor_impl
         return _visitor_impl
@@ -51,3 +99,106 @@ class Visitor:
         for child in obj:
             self.visit(child)
 
+
+# Stores the enter and leave methods of walkers
+_enter_methods = {}
+_leave_methods = {}
+
+# Resolved (enter, leave) methods, keyed on (walker class, node class)
+_hooks = {}
+
+def _resolve_hooks(class_type, arg_type):
+    hooks = []
+    for methods in (_enter_methods, _leave_methods):
+        try:
+            hooks.append(_resolve(class_type, arg_type, methods))
+        except KeyError:
+            hooks.append(None)
+    return tuple(hooks)
+
+# Hooks wrapped to time themselves, keyed like _hooks
+_timed_hooks = {}
+
+def _timed(hook):
+    owner = _declaring_class(hook)
+    def timed(self, node):
+        # The time of hooks run from this one, e.g. by a nested walk, is
+        # theirs, not this one's
+        global _inner
+        outer = _inner
+        _inner = 0.0
+        start = perf_counter()
+        try:
+            return hook(self, node)
+        finally:
+            elapsed = perf_counter() - start
+            _hook_times[owner] += elapsed - _inner
+            _inner = outer + elapsed
+    return timed
+
+def _resolve_timed_hooks(class_type, arg_type):
+    return tuple(_timed(hook) if hook else None for hook in _resolve_hooks(class_type, arg_type))
+
+def _hook(methods, index):
+    def decorator_for(arg_type):
+        def decorator(fn):
+            methods[(_declaring_class(fn), arg_type)] = fn
+            _hooks.clear()
+            _timed_hooks.clear()
+
+            def impl(self, node):
+                key = (type(self), type(node))
+                hooks = _hooks.get(key) or _hooks.setdefault(key, _resolve_hooks(*key))
+                if hooks[index]:
+                    return hooks[index](self, node)
+            return impl
+        return decorator
+    return decorator_for
+
+preorder = _hook(_enter_methods, 0)
+preorder.__doc__ = """Decorator for a walker method run before the children of a node."""
+postorder = _hook(_leave_methods, 1)
+postorder.__doc__ = """Decorator for a walker method run after the children of a node."""
+
+# Returned by an enter method to leave the children out
+SKIP = object()
+
+class Walker(Visitor):
+    """Walks a tree with an explicit stack instead of recursion, so that
+    its depth is only limited by memory. Instead of visit methods, walkers
+    have @preorder enter methods, run before a node's children, and
+    @postorder leave methods, run after them. An enter method can return
+    SKIP to leave the children out, or the node that replaced the entered
+    one, to walk that instead. Calling visit from a method starts a
+    separate walk."""
+
+    def visit(self, root):
+        if _hook_times is None:
+            hooks, resolve_hooks = _hooks, _resolve_hooks
+        else:
+            hooks, resolve_hooks = _timed_hooks, _resolve_timed_hooks
+        counts = _counts
+        stack = []
+        node = root
+        while True:
+            if node is not None:
+                key = (type(self), type(node))
+                enter, leave = hooks.get(key) or hooks.setdefault(key, resolve_hooks(*key))
+                if counts is not None:
+                    counts[key] += 1
+                result = enter(self, node) if enter else None
+                if result is SKIP:
+                    stack.append((node, iter(()), leave))
+                elif result is not None:
+                    node = result
+                    continue
+                else:
+                    stack.append((node, iter(node), leave))
+            if not stack:
+                return
+            parent, children, leave = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                if leave:
+                    leave(self, parent)
@@ -1,26 +1,75 @@
 from core import *
-import sys
-
-fname = sys.argv[1]
-with open(fname) as f:
-    text_input = f.read()
-
-lexer = Lexer().get_lexer()
-tokens = lexer.lex(text_input)
-
-
-pg = Parser()
-pg.parse()
-parser = pg.get_parser()
-module = parser.parse(tokens)
-scope(module)
-primitive_type(module)
-print_tree(module)
-resolve(module)
-cast(module)
-propagate_types(module)
-resolve(module)
-print_tree(module)
-ir = codegen(module)
-with open("out.ll", 'w') as output_file:
-    output_file.write(str(ir))
+from core import cache
+from core.codegen import target_key
+from core.instrument import Instrumentation
+from core.driver import analyze, compile_module, compile_source, compile_stream, extensions
+import argparse
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument('file')
+argparser.add_argument('--flat-scopes', action='store_true',
+                       help="use one scope per block instead of one per `let`")
+argparser.add_argument('--parser', choices=['rply', 'pratt'], default='rply',
+                       help="use the LALR parser generated by rply or the hand-written one")
+argparser.add_argument('--debug', action='store_true', help="print the tree between passes and the IR")
+argparser.add_argument('--time-passes', nargs='?', const='table', choices=['table', 'json'],
+                       help="report time, memory and nodes visited of each stage, as a table or JSON")
+argparser.add_argument('--profile-passes', metavar='DIR',
+                       help="write a cProfile dump of each stage to DIR")
+argparser.add_argument('--ssa', action='store_true',
+                       help="keep variables in registers instead of stack slots")
+argparser.add_argument('--emit', choices=['llvm', 'bc', 'obj'], default='llvm',
+                       help="output LLVM IR, bitcode or a native object file")
+argparser.add_argument('-O', dest='opt_level', type=int, choices=range(4), default=0,
+                       help="optimization level")
+argparser.add_argument('-o', '--output', help="output file (default: out.ll, out.bc or out.o)")
+argparser.add_argument('--incremental', action='store_true',
+                       help="only generate code for functions that changed since the last build")
+argparser.add_argument('-j', '--jobs', type=int, default=1,
+                       help="generate functions in this many worker processes")
+argparser.add_argument('--run', action='store_true',
+                       help="run main() in-process instead of writing a file")
+argparser.add_argument('--stream', action='store_true',
+                       help="compile one function at a time from a memory-mapped file, with the pratt parser")
+args = argparser.parse_args()
+if args.stream and (args.run or args.incremental or args.jobs > 1):
+    argparser.error("--stream cannot be combined with --run, --incremental or --jobs")
+
+instrumentation = Instrumentation(args.profile_passes)
+instrumented = bool(args.time_passes or args.profile_passes)
+
+
+def main():
+    if args.stream:
+        output = args.output or 'out' + extensions[args.emit]
+        compile_stream(args.file, output, args.emit, args.opt_level, args.ssa, args.flat_scopes, args.debug)
+        return
+
+    with open(args.file) as f:
+        text_input = f.read()
+
+    if args.run:
+        # Unchanged sources compiled the same way, for the same target,
+        # reuse the native object
+        key = cache.digest(cache.compiler_hash(), target_key(), text_input, args.opt_level, args.ssa,
+                           args.flat_scopes)
+        obj = None if instrumented else cache.load('object', key)
+        if obj is None:
+            module = analyze(text_input, args.flat_scopes, args.debug, args.parser)
+            mod = compile_module(module, args.ssa, args.opt_level, args.jobs, args.incremental, args.debug)
+            obj = compile_object(mod, args.opt_level)
+            cache.store('object', key, obj)
+        run(obj)
+    else:
+        output = args.output or 'out' + extensions[args.emit]
+        compile_source(text_input, output, args.emit, args.opt_level, args.ssa, args.flat_scopes,
+                       args.jobs, args.incremental, args.debug, args.parser)
+
+
+if instrumented:
+    with instrumentation:
+        main()
+    if args.time_passes:
+        instrumentation.report(format=args.time_passes)
+else:
+    main()
@@ -0,0 +1,67 @@
+from core.driver import compile_source, warm_up
+from core.instrument import Instrumentation
+from client import default_socket
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import traceback
+
+argparser = argparse.ArgumentParser(description="Serve compile requests from client.py over a Unix socket.")
+argparser.add_argument('--socket', default=default_socket(), help="where to listen")
+
+# What clients may set, as compile_source arguments
+options = {'output', 'format', 'opt_level', 'ssa', 'flat_scopes', 'jobs', 'incremental', 'debug'}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = 0
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                arguments = {k: v for k, v in request.items() if k in options}
+                if request.get('time_passes'):
+                    with Instrumentation() as instrumentation:
+                        compile_source(request['source'], **arguments)
+                    instrumentation.report(format=request['time_passes'])
+                else:
+                    compile_source(request['source'], **arguments)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+        response = dict(status=status, stdout=stdout.getvalue(), stderr=stderr.getvalue())
+        self.wfile.write(json.dumps(response).encode())
+
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Handles each request in a process forked from the server, so that
+    requests run concurrently and all start with everything warm."""
+
+
+def main():
+    args = argparser.parse_args()
+    warm_up()
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(args.socket)
+    # Only the owner may connect. The mask is restored once the socket is
+    # bound, so that outputs are created with the usual permissions.
+    umask = os.umask(0o077)
+    try:
+        server = Server(args.socket, Handler)
+    finally:
+        os.umask(umask)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()